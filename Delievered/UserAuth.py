@@ -1,12 +1,11 @@
 import streamlit as st
 import hashlib
 import hmac
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import mysql.connector
-from db_connection import table, db_credentials
-from smtp_connections import *
+import pandas as pd
+from db_connection import table, get_pool, db_error, PoolTimeout
+from user_directory import fetch_user_page, SORT_COLUMNS, PAGE_SIZES
+from email_outbox import get_outbox
+from perf import span, get_perf, prometheus_gauge
 
 class UserAuth:
     def __init__(self):
@@ -22,30 +21,14 @@ class UserAuth:
 
 
     def send_email(self, to_email, subject, body):
-        """Send an email using smtplib."""
+        """Queue an email for the background outbox worker instead of sending it inline."""
         try:
-            # Create a multipart email
-            msg = MIMEMultipart()
-            msg["Subject"] = subject
-            msg["From"] = EMAIL_ADDRESS
-            msg["To"] = to_email
-
-            # Attach the email body
-            msg.attach(MIMEText(body, "plain"))
-
-            # Connect to SMTP Server
-            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-            server.starttls()  # Start TLS encryption
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-
-            # Send the email
-            server.sendmail(EMAIL_ADDRESS, to_email, msg.as_string())
-            server.quit()
-
-            st.success("✅ Email sent successfully!")
-        
+            with span('smtp.enqueue'):
+                get_outbox().enqueue(to_email, subject, body)
+            st.success("✅ Email queued for delivery!")
+
         except Exception as e:
-            st.error(f"Failed to send email: {e}")
+            st.error(f"Failed to queue email: {e}")
 
 
     def validate_user_password(self):
@@ -120,19 +103,19 @@ class UserAuth:
             self.is_admin_authenticated = False
             return
 
-        connection = None
-        cursor = None
         try:
-            # Establish database connection
-            connection = db_credentials()  # Your MySQL connection function
-            cursor = connection.cursor(dictionary=True)
-
-            # Fetch user credentials
-            cursor.execute(f"SELECT * FROM {table} WHERE username = %s", (username,))
-            user = cursor.fetchone()  # Fetch only one result to avoid unread errors
-
-            # Ensure all results are consumed before closing cursor
-            cursor.fetchall()  # This prevents "Unread result found" if multiple rows exist
+            # Borrow a connection from the shared pool
+            with span('db.verify_user_password'), get_pool().connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                try:
+                    # Fetch user credentials
+                    cursor.execute(f"SELECT * FROM {table} WHERE username = %s", (username,))
+                    user = cursor.fetchone()  # Fetch only one result to avoid unread errors
+
+                    # Ensure all results are consumed before closing cursor
+                    cursor.fetchall()  # This prevents "Unread result found" if multiple rows exist
+                finally:
+                    cursor.close()
 
             if user:
                 stored_password = user.get("password")
@@ -149,24 +132,15 @@ class UserAuth:
                 st.session_state["is_authenticated"] = False
                 self.is_authenticated = False
 
-        except mysql.connector.Error as err:
+        except db_error() as err:
             st.error(f"Database error: {err}")
 
+        except PoolTimeout as e:
+            st.error(f"Database busy, please try again: {e}")
+
         except Exception as e:
             st.error(f"An error occurred: {e}")
 
-        finally:
-            # Ensure cursor and connection are properly closed
-            if cursor:
-                cursor.close()
-            if connection and connection.is_connected():
-                connection.close()
-
-
-
-
-
-
     def verify_admin_password(self):
         """Verify the admin's password."""
         admin_username = st.session_state.get("admin_username")
@@ -199,31 +173,30 @@ class UserAuth:
 
     def add_user(self, username, email, dob, password):
         """ Add a new user to the MySQL database."""
+        if not (username and email and dob and password):
+            st.warning("Please fill up the form")
+            return
+
         try:
             hashed_password = self.hash_password(password)
-            
-            # Create a database connection
-            connection = db_credentials()
-            cursor = connection.cursor()  # Create a cursor
-
-            if username and email and dob and password:
-                # SQL Query to insert user data
-                query = f"INSERT INTO {table} (username, email, dob, password) VALUES (%s, %s, %s, %s)"
-                values = (username, email, dob, hashed_password)
-
-                cursor.execute(query, values)
-                connection.commit()
-
-                # Close connection
-                cursor.close()
-                connection.close()
-                
-                st.success("User registered successfully!")
-                self.send_email(email, "Registration Successful", f"Dear {username},\n\nYour registration was successful.")
-            else:
-                st.warning("Please fill up the form")
 
-        except mysql.connector.Error as e:
+            # Borrow a connection from the shared pool
+            with span('db.add_user'), get_pool().connection() as connection:
+                cursor = connection.cursor()  # Create a cursor
+                try:
+                    # SQL Query to insert user data
+                    query = f"INSERT INTO {table} (username, email, dob, password) VALUES (%s, %s, %s, %s)"
+                    values = (username, email, dob, hashed_password)
+
+                    cursor.execute(query, values)
+                    connection.commit()
+                finally:
+                    cursor.close()
+
+            st.success("User registered successfully!")
+            self.send_email(email, "Registration Successful", f"Dear {username},\n\nYour registration was successful.")
+
+        except db_error() as e:
             st.error(f"MySQL Error: {e}")
         except Exception as e:
             st.error(f"An error occurred: {e}")
@@ -248,38 +221,35 @@ class UserAuth:
     def reset_password(self, email, dob, new_password):
         """Reset a user's password in MySQL."""
         try:
-            # Create database connection
-            connection = db_credentials()  # Assuming this function gives a valid MySQL connection
-            cursor = connection.cursor(dictionary=True)  # Use dictionary cursor for easier access
-
-            # Check if user exists
-            cursor.execute(f"SELECT * FROM {table} WHERE email = %s AND dob = %s", (email, dob))
-            user = cursor.fetchone()  # Fetch the first matching row
+            # Borrow a connection from the shared pool
+            with span('db.reset_password'), get_pool().connection() as connection:
+                cursor = connection.cursor(dictionary=True)  # Use dictionary cursor for easier access
+                try:
+                    # Check if user exists
+                    cursor.execute(f"SELECT * FROM {table} WHERE email = %s AND dob = %s", (email, dob))
+                    user = cursor.fetchone()  # Fetch the first matching row
+                    cursor.fetchall()
+
+                    if user:
+                        # Hash the new password
+                        hashed_password = self.hash_password(new_password)
+
+                        # Update password in the database
+                        cursor.execute(f"UPDATE {table} SET password = %s WHERE email = %s", (hashed_password, email))
+                        connection.commit()  # Save changes
+                finally:
+                    cursor.close()
 
             if user:
-                # Hash the new password
-                hashed_password = self.hash_password(new_password)
-                
-                # Update password in the database
-                cursor.execute("UPDATE users SET password = %s WHERE email = %s", (hashed_password, email))
-                connection.commit()  # Save changes
-                
                 st.success("Password reset successfully.")
             else:
                 st.error("Invalid Email or Date of Birth.")
 
-        except mysql.connector.Error as err:
+        except db_error() as err:
             st.error(f"Database error: {err}")
         except Exception as e:
             st.error(f"An error occurred: {e}")
 
-        finally:
-            # Close cursor and connection safely
-            if 'cursor' in locals() and cursor:
-                cursor.close()
-            if 'connection' in locals() and connection.is_connected():
-                connection.close()
-
 
 
 
@@ -298,13 +268,15 @@ class UserAuth:
     def retrieve_user_id(self, dob):
         """Retrieve and display the user ID(s) associated with the given date of birth."""
         try:
-            # Create a database connection
-            connection = db_credentials()
-            cursor = connection.cursor()  # Create a cursor
-
-            # Execute SQL query
-            cursor.execute(f"SELECT username FROM {table} WHERE dob = %s", (dob,))
-            found_users = cursor.fetchall()  # Fetch data
+            # Borrow a connection from the shared pool
+            with span('db.retrieve_user_id'), get_pool().connection() as connection:
+                cursor = connection.cursor()  # Create a cursor
+                try:
+                    # Execute SQL query
+                    cursor.execute(f"SELECT username FROM {table} WHERE dob = %s", (dob,))
+                    found_users = cursor.fetchall()  # Fetch data
+                finally:
+                    cursor.close()
 
             if found_users:
                 # Extract usernames from tuples
@@ -313,52 +285,109 @@ class UserAuth:
             else:
                 st.error("No user found with the given Date of Birth.")
 
-        except mysql.connector.Error as err:
+        except db_error() as err:
             st.error(f"Database error: {err}")
         except Exception as e:
             st.error(f"An error occurred: {e}")
-        finally:
-            # Close cursor and connection safely
-            if 'cursor' in locals() and cursor:
-                cursor.close()
-            if 'connection' in locals() and connection.is_connected():
-                connection.close()
 
 
 
 
     def admin_view_all_users(self):
-        """Allow the admin to view all users in the MySQL database."""
+        """Allow the admin to browse the users in the MySQL database, one page at a time."""
+        search_col, sort_col, order_col = st.columns([3, 2, 1])
+        search     = search_col.text_input("Search username or email", key="users_search")
+        sort       = sort_col.selectbox("Sort by", SORT_COLUMNS, key="users_sort")
+        descending = order_col.toggle("Descending", key="users_descending")
+        page_size  = st.selectbox("Rows per page", PAGE_SIZES, key="users_page_size")
+
+        # Keyset cursors of the pages visited so far; reset whenever the query changes
+        query = (search, sort, descending, page_size)
+        if st.session_state.get("users_query") != query:
+            st.session_state["users_query"] = query
+            st.session_state["users_cursors"] = [None]
+        cursors = st.session_state["users_cursors"]
 
         try:
-            # Create a database connection
-            connection = db_credentials()
-            cursor = connection.cursor()  # Create a cursor
-            cursor.execute(f"SELECT username, email, dob FROM {table}")  # Fetch data
-            users = cursor.fetchall()  # Get all rows
-
-            if users:
-                st.write("Current Users in the Database:")
-                for user in users:
-                    st.write(f"Username: {user[0]}, Email: {user[1]}, DOB: {user[2]}")  # Use tuple indexing
-            else:
-                st.warning("No users found in the database.")
+            # Borrow a connection from the shared pool
+            with span('db.admin_view_all_users'), get_pool().connection() as connection:
+                users, next_cursor = fetch_user_page(connection, search, sort, descending, page_size, cursors[-1])
 
-        except mysql.connector.Error as err:
+        except (db_error(), PoolTimeout) as err:
             st.error(f"Database error: {err}")
+            return
+
+        if users:
+            st.write("Current Users in the Database:")
+            st.dataframe(pd.DataFrame(users, columns=["Username", "Email", "DOB"]), hide_index=True, use_container_width=True)
+        else:
+            st.warning("No users found in the database.")
 
-        finally:
-            # Ensure cursor and connection are closed only if they exist
-            if 'cursor' in locals() and cursor:
-                cursor.close()
-            if 'connection' in locals() and connection.is_connected():
-                connection.close()
+        previous_col, page_col, next_col = st.columns(3)
+        if previous_col.button("Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+        page_col.write(f"Page {len(cursors)}")
+        if next_col.button("Next", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
 
 
     def admin_dashboard(self):
         """Show the admin dashboard in the sidebar."""
         st.sidebar.write("## Admin Dashboard")
         if st.sidebar.button("View All Users"):
+            st.session_state["show_all_users"] = True
+        if st.sidebar.button("Performance"):
+            st.session_state["show_perf"] = True
+
+        # Stay on the listing while the admin pages, sorts or searches through it
+        if st.session_state.get("show_all_users"):
             self.admin_view_all_users()
 
+        if st.session_state.get("show_perf"):
+            self.admin_perf_panel()
+
+
+    def admin_perf_panel(self):
+        """Show per-section timings and the shared pools/caches counters of this server."""
+        from data_cache import get_data_cache
+        from figure_cache import get_figure_cache
+        from prefetch import get_prefetcher
+        from fundamentals import get_fundamentals
+        from providers import get_provider
+
+        st.header("Performance")
+        perf = get_perf()
+        summary = perf.summary()
+        if summary:
+            rows = pd.DataFrame.from_dict(summary, orient="index")
+            for column in ["mean", "p50", "p95", "p99"]:
+                rows[column] = (rows[column] * 1000).round(1)
+            st.write("Section timings (ms), slowest p95 first:")
+            st.dataframe(rows, use_container_width=True)
+        else:
+            st.info("No timings recorded yet.")
+
+        upstream = get_provider().stats()
+        st.write("Shared resources:")
+        st.json({
+            "db_pool": get_pool().stats(),
+            "email_outbox": get_outbox().metrics(),
+            "data_cache": get_data_cache().stats(),
+            "figure_cache": get_figure_cache().stats(),
+            "prefetch": get_prefetcher().stats(),
+            "fundamentals": get_fundamentals().stats(),
+            "upstream": upstream,
+        }, expanded=False)
+
+        # Includes connection reuse: connections_opened counts TCP+TLS handshakes to the provider
+        metrics = perf.prometheus() + prometheus_gauge('upstream', upstream)
+        st.download_button("Download Prometheus metrics", metrics, file_name="metrics.prom", mime="text/plain")
+        with st.expander("Prometheus text format"):
+            st.code(metrics, language="text")
+        if st.button("Reset timings"):
+            perf.reset()
+            st.rerun()
+
 
@@ -0,0 +1,108 @@
+"""Cold-start cost of the app: module import time and time to first paint of the login page.
+
+Every sample runs in a fresh interpreter so nothing is cached between runs. Run from the
+Delievered directory; pass --app ../stock_price.py to measure the root app instead:
+
+    python benchmarks/bench_cold_start.py --runs 5
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_APP = os.path.join(os.path.dirname(HERE), 'stock_price.py')
+
+# Dummy secrets: first paint is the login page, which must not need a real DB or SMTP server
+SECRETS = {
+    'admin': {'email': 'admin@example.com', 'password': 'admin', 'user_id': 'admin'},
+    'connections': {
+        'freesqldatabase': {'host': '127.0.0.1', 'database': 'none', 'user': 'none', 'password': 'none', 'port': 1},
+        'smpt_server': {'SMTP_SERVER': '127.0.0.1', 'SMTP_PORT': 1, 'EMAIL_ADDRESS': 'a@example.com', 'EMAIL_PASSWORD': ''},
+    },
+}
+
+IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {app_dir!r})
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+FIRST_PAINT_SNIPPET = """
+import os, sys, json, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+os.chdir({app_dir!r})
+sys.path.insert(0, {app_dir!r})
+at = AppTest.from_file({app!r}, default_timeout=120)
+for section, values in json.loads({secrets!r}).items():
+    at.secrets[section] = values
+at.run()
+assert not at.exception, at.exception
+print(time.perf_counter() - started)
+"""
+
+
+def run_python(code, *flags):
+    result = subprocess.run([sys.executable, *flags, '-c', code], capture_output=True, text=True, check=True)
+    return result
+
+
+def import_time(app):
+    app_dir, module = os.path.split(os.path.abspath(app))
+    code = IMPORT_SNIPPET.format(app_dir=app_dir, module=module[:-3])
+    return float(run_python(code).stdout.strip().splitlines()[-1])
+
+
+def first_paint_time(app):
+    app = os.path.abspath(app)
+    code = FIRST_PAINT_SNIPPET.format(app_dir=os.path.dirname(app), app=app, secrets=json.dumps(SECRETS))
+    return float(run_python(code).stdout.strip().splitlines()[-1])
+
+
+def heaviest_imports(app, top):
+    """Parse python -X importtime for the app's direct imports with the largest cumulative time."""
+    app_dir, module = os.path.split(os.path.abspath(app))
+    code = IMPORT_SNIPPET.format(app_dir=app_dir, module=module[:-3])
+    stderr = run_python(code, '-X', 'importtime').stderr
+
+    # importtime lists children before their parent, indented two spaces per level
+    children = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        indent = len(name) - len(name.lstrip())
+        if indent == 1:
+            if name.strip() == module[:-3]:
+                return sorted(children, reverse=True)[:top]
+            children = []
+        elif indent == 3:
+            children.append((int(cumulative), name.strip()))
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default=DEFAULT_APP)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    imports = [import_time(args.app) for _ in range(args.runs)]
+    paints = [first_paint_time(args.app) for _ in range(args.runs)]
+
+    print(f"{args.app}  ({args.runs} fresh interpreters each)")
+    print(f"module import:  median {statistics.median(imports) * 1000:8.1f} ms   min {min(imports) * 1000:8.1f} ms")
+    print(f"first paint:    median {statistics.median(paints) * 1000:8.1f} ms   min {min(paints) * 1000:8.1f} ms")
+    print("heaviest top-level imports (cumulative):")
+    for micros, name in heaviest_imports(args.app, args.top):
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Login lookup latency on the user table at 10k, 100k and 1M users, with and without indexes.
+
+Needs a scratch MySQL database; the benchmark creates and drops its own table there:
+
+    python benchmarks/bench_login_lookup.py --host 127.0.0.1 --user bench --password ... --database bench
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import mysql.connector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema
+
+BENCH_TABLE = 'bench_user_accounts'
+INSERT_CHUNK = 10_000
+
+
+def insert_users(connection, start, stop):
+    cursor = connection.cursor()
+    query = f"INSERT INTO {BENCH_TABLE} (username, email, dob, password) VALUES (%s, %s, %s, %s)"
+    for chunk_start in range(start, stop, INSERT_CHUNK):
+        rows = [
+            (f"user{i:07d}", f"user{i:07d}@example.com", f"{i % 28 + 1:02d}{i % 12 + 1:02d}{i % 100:02d}", "0" * 64)
+            for i in range(chunk_start, min(chunk_start + INSERT_CHUNK, stop))
+        ]
+        cursor.executemany(query, rows)
+        connection.commit()
+    cursor.close()
+
+
+def time_logins(connection, users, samples):
+    """Run the verify_user_password lookup for random existing users; return latencies in ms."""
+    query = schema.lookup_queries(BENCH_TABLE)['verify_user_password'][0]
+    cursor = connection.cursor(dictionary=True)
+    latencies = []
+    for _ in range(samples):
+        username = f"user{random.randrange(users):07d}"
+        started = time.perf_counter()
+        cursor.execute(query, (username,))
+        cursor.fetchall()
+        latencies.append((time.perf_counter() - started) * 1000)
+    cursor.close()
+    return sorted(latencies)
+
+
+def drop_indexes(connection):
+    cursor = connection.cursor()
+    for index_name in schema.INDEXES:
+        cursor.execute(f"DROP INDEX {index_name} ON {BENCH_TABLE}")
+    cursor.close()
+
+
+def report(label, users, latencies):
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{users:>9,} users  {label:<10} p50 {p50:8.3f} ms   p95 {p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=os.environ.get('MYSQL_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('MYSQL_PORT', 3306)))
+    parser.add_argument('--user', default=os.environ.get('MYSQL_USER', 'root'))
+    parser.add_argument('--password', default=os.environ.get('MYSQL_PASSWORD', ''))
+    parser.add_argument('--database', default=os.environ.get('MYSQL_DATABASE', 'bench'))
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--samples', type=int, default=500)
+    parser.add_argument('--unindexed-samples', type=int, default=20,
+                        help='lookups timed without indexes (full scans are slow at 1M rows)')
+    args = parser.parse_args()
+
+    connection = mysql.connector.connect(host=args.host, port=args.port, user=args.user,
+                                         password=args.password, database=args.database)
+    cursor = connection.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    cursor.close()
+    schema.ensure_schema(connection, BENCH_TABLE)
+
+    try:
+        loaded = 0
+        for size in (int(size) for size in args.sizes.split(',')):
+            insert_users(connection, loaded, size)
+            loaded = size
+
+            plans = schema.explain_lookups(connection, BENCH_TABLE)
+            report(f"indexed ({plans['verify_user_password']})", size, time_logins(connection, size, args.samples))
+
+        drop_indexes(connection)
+        report("no index", loaded, time_logins(connection, loaded, args.unindexed_samples))
+    finally:
+        cursor = connection.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        cursor.close()
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
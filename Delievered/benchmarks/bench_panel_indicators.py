@@ -0,0 +1,90 @@
+"""Compare the per-ticker indicator path in utils.py with the panel path in panel_indicators.py.
+
+Run from the Delievered directory:
+
+    python benchmarks/bench_panel_indicators.py --bars 252 --tickers 30
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import calculate_bollinger_bands, calculate_macd, calculate_rsi
+from panel_indicators import panel_bollinger_bands, panel_macd, panel_rsi
+
+
+def synthetic_panel(bars, tickers, seed=0):
+    """Random-walk closes with staggered listing dates and a few missing days per ticker."""
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (bars, tickers)), axis=0))
+    listed = rng.integers(0, bars // 4 + 1, tickers)
+    for column, first_bar in enumerate(listed):
+        prices[:first_bar, column] = np.nan
+    gaps = rng.random((bars, tickers)) < 0.01
+    prices[gaps] = np.nan
+    return prices
+
+
+def per_ticker(prices):
+    """The current path: one DataFrame and three indicator calls per ticker."""
+    results = []
+    for column in range(prices.shape[1]):
+        data = pd.DataFrame({'Close': prices[:, column]}).dropna()
+        results.append((
+            calculate_bollinger_bands(data),
+            calculate_macd(data),
+            calculate_rsi(data),
+        ))
+    return results
+
+
+def panel(prices):
+    return panel_bollinger_bands(prices), panel_macd(prices), panel_rsi(prices)
+
+
+def best_of(fn, prices, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(prices)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def max_difference(prices, ticker_results, panel_results):
+    """Largest absolute gap between both paths over every indicator output."""
+    worst = 0.0
+    bands, macd, rsi = panel_results
+    for column, (ticker_bands, ticker_macd, ticker_rsi) in enumerate(ticker_results):
+        rows = ~np.isnan(prices[:, column])
+        pairs = list(zip(ticker_bands, bands)) + list(zip(ticker_macd, macd)) + [(ticker_rsi, rsi)]
+        for expected, actual in pairs:
+            diff = np.abs(expected.to_numpy() - actual[rows, column])
+            if np.any(~np.isnan(diff)):
+                worst = max(worst, np.nanmax(diff))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bars', type=int, default=252)
+    parser.add_argument('--tickers', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    prices = synthetic_panel(args.bars, args.tickers)
+    ticker_time = best_of(per_ticker, prices, args.repeat)
+    panel_time = best_of(panel, prices, args.repeat)
+
+    print(f"{args.bars} bars x {args.tickers} tickers")
+    print(f"per-ticker: {ticker_time * 1000:9.2f} ms")
+    print(f"panel:      {panel_time * 1000:9.2f} ms  ({ticker_time / panel_time:.1f}x)")
+    print(f"max abs difference: {max_difference(prices, per_ticker(prices), panel(prices)):.3g}")
+
+
+if __name__ == '__main__':
+    main()
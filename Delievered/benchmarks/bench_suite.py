@@ -0,0 +1,239 @@
+"""Regression benchmarks: the utils.py indicators at 1k-10M bars and full page reruns.
+
+Each benchmark records wall time (median, spread and best of --repeat runs), plus, from one
+extra run under tracemalloc, peak traced memory and retained_blocks: the memory blocks still
+allocated after the run. tracemalloc sees only live blocks, so this is a net count, not the number
+of allocations made; peak memory is what the gate checks. Page reruns drive StockAnalysisApp
+through Streamlit's AppTest as a logged-in user, with the replay provider (no network) and dummy
+DB secrets (the page never queries MySQL once logged in). The server's background threads
+(universe warmup, fundamentals refresh, schema bootstrap) are not started, and prefetches finish
+before every timed run, so only the rerun itself is measured.
+
+A benchmark regresses when its median exceeds the baseline median by the threshold plus a noise
+band: NOISE_SPREADS times the baseline's spread, and never less than MIN_SECONDS.
+
+Run from the Delievered directory:
+
+    python benchmarks/bench_suite.py --save        # record baselines.json on this machine
+    python benchmarks/bench_suite.py               # compare; exits 1 on a regression
+    python benchmarks/bench_suite.py --only rsi --sizes 1000 100000
+"""
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import statistics
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+sys.path.insert(0, APP_DIR)
+
+# Must be set before the app resolves its provider
+os.environ['MARKET_DATA_PROVIDER'] = 'replay'
+os.environ['MARKET_DATA_LATENCY_MS'] = '0'
+
+import numpy as np
+import pandas as pd
+from utils import calculate_bollinger_bands, calculate_macd, calculate_rsi
+
+BASELINE_PATH = os.path.join(HERE, 'baselines.json')
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+# Relative slowdown (or peak memory growth) over the baseline that fails the run
+THRESHOLD = 0.25
+REPEAT = 15
+# Slack on top of the threshold: multiples of the baseline's spread (median absolute deviation),
+# at least MIN_SECONDS, since a few ms of scheduler noise is common on shared machines
+NOISE_SPREADS = 3
+MIN_SECONDS = 0.01
+
+INDICATORS = {
+    'bollinger_bands': calculate_bollinger_bands,
+    'macd': calculate_macd,
+    'rsi': calculate_rsi,
+}
+
+SECRETS = {
+    'admin': {'email': 'admin@example.com', 'password': 'admin', 'user_id': 'admin'},
+    'connections': {
+        'freesqldatabase': {'host': '127.0.0.1', 'database': 'none', 'user': 'none', 'password': 'none', 'port': 1},
+        'smpt_server': {'SMTP_SERVER': '127.0.0.1', 'SMTP_PORT': 1, 'EMAIL_ADDRESS': 'a@example.com', 'EMAIL_PASSWORD': ''},
+    },
+}
+
+
+def measure(fn, repeat, settle=None):
+    """Wall time of fn() over repeat runs, then peak bytes and retained blocks of one traced run.
+
+    settle() runs untimed before every run, to let background work from the previous one finish.
+    """
+    timings = []
+    for _ in range(repeat):
+        if settle is not None:
+            settle()
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    if settle is not None:
+        settle()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn()
+    after = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+
+    median = statistics.median(timings)
+    return {
+        'median_s': median,
+        'spread_s': statistics.median(abs(timing - median) for timing in timings),
+        'best_s': min(timings),
+        'peak_bytes': peak,
+        'retained_blocks': blocks,
+    }
+
+
+def bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('1990-01-01', periods=n, freq='min')
+    return pd.DataFrame({'Close': 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))}, index=index)
+
+
+def indicator_benchmarks(sizes, names, repeat):
+    results = {}
+    for size in sizes:
+        data = bars(size)
+        # Large inputs are slow enough that fewer repeats are just as stable
+        runs = max(3, repeat if size < 1_000_000 else repeat // 3)
+        for name in names:
+            fn = INDICATORS[name]
+            results[f'{name}[{size}]'] = measure(lambda: fn(data), runs)
+            print(f"  {name}[{size}]: {results[f'{name}[{size}]']['median_s'] * 1000:.2f} ms", flush=True)
+    return results
+
+
+def page_benchmarks(repeat):
+    """Full stock_analysis reruns: first run of a session, plain rerun, and rerun after a panel toggle."""
+    from streamlit.testing.v1 import AppTest
+    import schema
+    import fundamentals
+    import universe_loader
+    from prefetch import get_prefetcher
+
+    # The script's __main__ block would start these server threads; they would compete with the timed reruns
+    schema.start_schema_bootstrap = lambda: None
+    universe_loader.start_universe_warmup = lambda *args: None
+    fundamentals.start_fundamentals_refresh = lambda *args: None
+
+    def settle():
+        prefetcher = get_prefetcher()
+        while prefetcher.stats()['pending']:
+            time.sleep(0.01)
+
+    def new_session():
+        at = AppTest.from_file(os.path.join(APP_DIR, 'stock_price.py'), default_timeout=120)
+        for section, values in SECRETS.items():
+            at.secrets[section] = values
+        at.session_state['is_authenticated'] = True
+        return at
+
+    def checked_run(at):
+        at.run()
+        assert not at.exception, at.exception
+
+    # Warm the price store and server-wide caches so only app-side work is measured
+    warm = new_session()
+    checked_run(warm)
+
+    at = new_session()
+    checked_run(at)
+    for toggle in at.toggle:
+        toggle.set_value(True)
+    checked_run(at)
+
+    def toggle_rsi():
+        toggle = at.toggle(key='rsi')
+        toggle.set_value(not toggle.value)
+        checked_run(at)
+
+    results = {
+        'page_first_run': measure(lambda: checked_run(new_session()), repeat, settle),
+        'page_rerun': measure(lambda: checked_run(at), repeat, settle),
+        'page_rerun_toggle': measure(toggle_rsi, repeat, settle),
+    }
+    for name, result in results.items():
+        print(f"  {name}: {result['median_s'] * 1000:.1f} ms", flush=True)
+    return results
+
+
+def compare(results, baselines, threshold):
+    """Return a message per benchmark that got slower or hungrier than its baseline allows."""
+    failures = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        if 'median_s' not in baseline or 'spread_s' not in baseline:
+            failures.append(f"{name}: baseline predates median timings; re-record with --save")
+            continue
+        noise = max(NOISE_SPREADS * baseline['spread_s'], MIN_SECONDS)
+        limit = baseline['median_s'] * (1 + threshold) + noise
+        if result['median_s'] > limit:
+            failures.append(f"{name}: {result['median_s'] * 1000:.2f} ms vs baseline "
+                            f"{baseline['median_s'] * 1000:.2f} ms (limit {limit * 1000:.2f} ms)")
+        if result['peak_bytes'] > baseline['peak_bytes'] * (1 + threshold) + 1024 * 1024:
+            failures.append(f"{name}: peak {result['peak_bytes'] / 2 ** 20:.1f} MiB vs baseline "
+                            f"{baseline['peak_bytes'] / 2 ** 20:.1f} MiB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--only', nargs='+', choices=list(INDICATORS) + ['page'], default=list(INDICATORS) + ['page'])
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help='write the results as the new baselines')
+    args = parser.parse_args()
+
+    results = {}
+    names = [name for name in args.only if name in INDICATORS]
+    if names:
+        print("indicators:")
+        results.update(indicator_benchmarks(args.sizes, names, args.repeat))
+    if 'page' in args.only:
+        print("page reruns:")
+        results.update(page_benchmarks(args.repeat))
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    if args.save:
+        baselines.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} baselines to {args.baseline}")
+        return 0
+
+    if not baselines:
+        print(f"No baselines at {args.baseline}; run with --save first")
+        return 0
+
+    failures = compare(results, baselines, args.threshold)
+    for failure in failures:
+        print("REGRESSION", failure)
+    print(f"{len(results)} benchmarks, {len(failures)} regressions (threshold {args.threshold:.0%})")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
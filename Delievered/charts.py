@@ -0,0 +1,104 @@
+from plotly.subplots import make_subplots
+import plotly.graph_objs as go
+from utils import calculate_rsi, calculate_bollinger_bands, calculate_macd
+from downsample import downsample_line, downsample_bars
+
+# Dashboard panels in display order, with their subplot title and height in pixels
+PANELS = {
+    'bollinger_bands': ('Bollinger Bands', 400),
+    'trading_volume': ('Trading Volume', 200),
+    'macd': ('MACD (Moving Average Convergence Divergence)', 250),
+    'rsi': ('Relative Strength Index (RSI)', 250),
+}
+
+# Indicator parameters used by the dashboard; part of every figure cache key
+INDICATOR_PARAMS = {
+    'bollinger_bands': {'window': 20, 'num_std': 2},
+    'macd': {'short_window': 12, 'long_window': 26, 'signal_window': 9},
+    'rsi': {'periods': 14},
+}
+
+
+def _xy(series):
+    return dict(x=series.index, y=series)
+
+
+def panel_series(history, panel, mask=slice(None)):
+    """The series drawn in one panel, {name: series}, computed on the full history, cut to mask and downsampled.
+
+    This is the expensive part of a panel, so callers can cache it per panel.
+    """
+    if panel == 'bollinger_bands':
+        rolling_mean, upper_band, lower_band = calculate_bollinger_bands(history, **INDICATOR_PARAMS['bollinger_bands'])
+        return {
+            'Close Price': downsample_line(history['Close'][mask]),
+            'Upper Band': downsample_line(upper_band[mask]),
+            'Rolling Mean': downsample_line(rolling_mean[mask]),
+            'Lower Band': downsample_line(lower_band[mask]),
+        }
+    if panel == 'trading_volume':
+        return {'Volume': downsample_bars(history['Volume'][mask])}
+    if panel == 'macd':
+        macd_line, signal_line, macd_histogram = calculate_macd(history, **INDICATOR_PARAMS['macd'])
+        return {
+            'MACD Line': downsample_line(macd_line[mask]),
+            'Signal Line': downsample_line(signal_line[mask]),
+            'MACD Histogram': downsample_bars(macd_histogram[mask]),
+        }
+    if panel == 'rsi':
+        return {'RSI': downsample_line(calculate_rsi(history, **INDICATOR_PARAMS['rsi'])[mask])}
+    raise ValueError(f"Unknown panel {panel!r}")
+
+
+def dashboard_figure(history, panels, mask=slice(None), series_for=None):
+    """One figure with a shared date axis and a row per enabled panel.
+
+    Indicators are computed on the full history and then cut to mask (the visible range)
+    and downsampled, so their warm-up periods do not depend on the zoom. series_for(panel)
+    can supply each panel's series (see panel_series) from a cache.
+    """
+    series_for = series_for or (lambda panel: panel_series(history, panel, mask))
+    panels = [panel for panel in PANELS if panel in panels]
+    fig = make_subplots(
+        rows=len(panels),
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.04,
+        subplot_titles=[PANELS[panel][0] for panel in panels],
+        row_heights=[PANELS[panel][1] for panel in panels],
+    )
+
+    for row, panel in enumerate(panels, start=1):
+        series = series_for(panel)
+        if panel == 'bollinger_bands':
+            fig.add_trace(go.Scattergl(**_xy(series['Close Price']), name='Close Price'), row=row, col=1)
+            fig.add_trace(go.Scattergl(**_xy(series['Upper Band']), name='Upper Band', line=dict(color='red')), row=row, col=1)
+            fig.add_trace(go.Scattergl(**_xy(series['Rolling Mean']), name='Rolling Mean', line=dict(color='blue')), row=row, col=1)
+            fig.add_trace(go.Scattergl(**_xy(series['Lower Band']), name='Lower Band', line=dict(color='green')), row=row, col=1)
+            fig.update_yaxes(title_text='Price', row=row, col=1)
+
+        elif panel == 'trading_volume':
+            fig.add_trace(go.Bar(**_xy(series['Volume']), name='Volume',
+                                 marker=dict(color='rgba(255, 153, 51, 1.0)')), row=row, col=1)
+            fig.update_yaxes(title_text='Volume', row=row, col=1)
+
+        elif panel == 'macd':
+            fig.add_trace(go.Scattergl(**_xy(series['MACD Line']), name='MACD Line', line=dict(color='blue')), row=row, col=1)
+            fig.add_trace(go.Scattergl(**_xy(series['Signal Line']), name='Signal Line', line=dict(color='red')), row=row, col=1)
+            fig.add_trace(go.Bar(**_xy(series['MACD Histogram']), name='MACD Histogram', marker=dict(color='green')), row=row, col=1)
+            fig.update_yaxes(title_text='MACD', row=row, col=1)
+
+        elif panel == 'rsi':
+            fig.add_trace(go.Scattergl(**_xy(series['RSI']), name='RSI', line=dict(color='purple')), row=row, col=1)
+            # Constant levels are layout shapes, not data traces
+            fig.add_hline(y=70, line=dict(color='red', dash='dash'), annotation_text='Overbought (70)', row=row, col=1)
+            fig.add_hline(y=30, line=dict(color='green', dash='dash'), annotation_text='Oversold (30)', row=row, col=1)
+            fig.update_yaxes(title_text='RSI', range=[0, 100], row=row, col=1)
+
+    fig.update_xaxes(title_text='Date', row=len(panels), col=1)
+    fig.update_layout(
+        height=sum(PANELS[panel][1] for panel in panels) + 100,
+        legend_title='Legend',
+        hovermode='x unified',
+    )
+    return fig
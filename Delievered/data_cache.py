@@ -0,0 +1,190 @@
+import os
+import time
+import gzip
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from providers import get_provider
+from upstream import background
+
+logger = logging.getLogger(__name__)
+
+# Compressed disk tier lives next to the app, one file per ticker field
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data_cache')
+
+# Seconds a cached Ticker attribute stays fresh
+FIELD_TTLS = {
+    'info': 15 * 60,
+    'recommendations': 6 * 60 * 60,
+}
+DEFAULT_TTL = 60 * 60
+# Past its TTL an entry is still served at once (and refreshed in the background) for this long
+STALE_LIMIT = 7 * 24 * 60 * 60
+# Threads refreshing stale entries
+REFRESH_WORKERS = 2
+
+# Entries kept in the in-process tier before the least recently used one is dropped
+MAX_MEMORY_ENTRIES = 256
+
+
+class TieredCache:
+    """In-process LRU in front of a gzip-compressed disk tier, with a TTL per field.
+
+    Expired entries are served stale-while-revalidate: the last good copy is returned at once and
+    reloaded in the background, and it is kept when the reload fails.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_entries=MAX_MEMORY_ENTRIES, ttls=None, stale_limit=STALE_LIMIT):
+        self.root = root
+        self.max_entries = max_entries
+        self.ttls = dict(FIELD_TTLS if ttls is None else ttls)
+        self.stale_limit = stale_limit
+        os.makedirs(self.root, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='cache-refresh')
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0,
+                         'stale_served': 0, 'refresh_errors': 0}
+
+    def _path(self, key):
+        ticker, field = key
+        return os.path.join(self.root, ticker, f'{field}.pkl.gz')
+
+    def _is_fresh(self, key, stored_at, now):
+        return now - stored_at < self.ttls.get(key[1], DEFAULT_TTL)
+
+    def _remember(self, key, entry):
+        """Put an entry in the memory tier, evicting the least recently used ones past the cap."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def _read_disk(self, key):
+        try:
+            with gzip.open(self._path(key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _write_disk(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path + '.tmp', 'wb') as f:
+            pickle.dump(entry, f)
+        os.replace(path + '.tmp', path)
+
+    def _store(self, key, loader):
+        entry = (time.time(), loader())
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+        return entry
+
+    def _refresh(self, key, loader):
+        try:
+            with background():
+                self._store(key, loader)
+        except Exception as e:
+            with self._lock:
+                self.counters['refresh_errors'] += 1
+            logger.warning("Refreshing %s %s failed, keeping the stale copy: %s", *key, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _revalidate(self, key, loader):
+        """Reload an entry in the background unless a reload of it is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._refresh_pool.submit(self._refresh, key, loader)
+
+    def get(self, ticker, field, loader):
+        """Return a cached field for a ticker, calling loader() only when neither tier holds a fresh copy.
+
+        A copy past its TTL but within stale_limit is returned as is while loader() refreshes it in the background.
+        """
+        key = (ticker.upper(), field)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_fresh(key, entry[0], now):
+                self._entries.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return entry[1]
+
+        if entry is None:
+            entry = self._read_disk(key)
+            if entry is not None and self._is_fresh(key, entry[0], now):
+                self._remember(key, entry)
+                with self._lock:
+                    self.counters['disk_hits'] += 1
+                return entry[1]
+
+        if entry is not None:
+            with self._lock:
+                self.counters['expired'] += 1
+            if now - entry[0] < self.stale_limit:
+                self._remember(key, entry)
+                self._revalidate(key, loader)
+                with self._lock:
+                    self.counters['stale_served'] += 1
+                return entry[1]
+
+        with self._lock:
+            self.counters['misses'] += 1
+        try:
+            return self._store(key, loader)[1]
+        except Exception:
+            if entry is None:
+                raise
+            # Even a very old copy beats an error page
+            logger.warning("Loading %s %s failed, serving a copy from %s", *key, time.ctime(entry[0]))
+            with self._lock:
+                self.counters['stale_served'] += 1
+            return entry[1]
+
+    def age(self, ticker, field):
+        """Seconds since the held copy of a field was loaded, or None if neither tier holds one."""
+        key = (ticker.upper(), field)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            return time.time() - entry[0]
+        try:
+            return time.time() - os.path.getmtime(self._path(key))
+        except OSError:
+            return None
+
+    def contains(self, ticker, field):
+        """True when either tier holds a fresh copy, without loading or counting a lookup."""
+        key = (ticker.upper(), field)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._is_fresh(key, entry[0], now)
+        try:
+            return self._is_fresh(key, os.path.getmtime(self._path(key)), now)
+        except OSError:
+            return False
+
+    def stats(self):
+        """Return a snapshot of the hit/miss counters and the memory tier size."""
+        with self._lock:
+            return dict(self.counters, memory_entries=len(self._entries))
+
+
+@st.cache_resource
+def get_data_cache():
+    """Return the ticker data cache shared by every session of this server."""
+    return TieredCache(os.path.join(CACHE_DIR, get_provider().namespace))
@@ -0,0 +1,144 @@
+import time
+import threading
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the checkout timeout."""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of DB-API connections with health checks and idle recycling."""
+
+    def __init__(self, connect, max_size=5, max_idle=300, checkout_timeout=5, health_check_after=30):
+        # connect: zero-argument callable returning a new connection
+        # max_idle: seconds an idle connection may sit in the pool before it is closed
+        # health_check_after: idle seconds after which a connection is pinged before reuse
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = []  # (connection, returned_at), most recently returned last
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self.metrics = {
+            'checkouts': 0,
+            'created': 0,
+            'reused': 0,
+            'recycled_idle': 0,
+            'failed_health_checks': 0,
+            'discarded': 0,
+            'timeouts': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    @staticmethod
+    def _is_healthy(connection):
+        try:
+            return connection.is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _take_idle(self):
+        """Pop the most recently used idle connection that is still fit for use."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, returned_at = self._idle.pop()
+
+            idle_for = time.monotonic() - returned_at
+            if idle_for > self.max_idle:
+                self._close(connection)
+                self._count('recycled_idle')
+            elif idle_for > self.health_check_after and not self._is_healthy(connection):
+                self._close(connection)
+                self._count('failed_health_checks')
+            else:
+                self._count('reused')
+                return connection
+
+    def _count(self, metric, amount=1):
+        with self._lock:
+            self.metrics[metric] += amount
+
+    def acquire(self):
+        """Check out a connection, waiting at most checkout_timeout seconds for a free slot."""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            self._count('timeouts')
+            raise PoolTimeout(f"No database connection available after {self.checkout_timeout}s")
+
+        waited = time.monotonic() - started
+        try:
+            connection = self._take_idle()
+            if connection is None:
+                connection = self._connect()
+                self._count('created')
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self.metrics['checkouts'] += 1
+            self.metrics['wait_seconds_total'] += waited
+            self.metrics['wait_seconds_max'] = max(self.metrics['wait_seconds_max'], waited)
+        return connection
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool, closing it instead when it is broken or mid-transaction."""
+        try:
+            if not discard:
+                try:
+                    # Drop anything a caller left uncommitted before the next checkout sees it
+                    connection.rollback()
+                except Exception:
+                    discard = True
+
+            if discard:
+                self._close(connection)
+                self._count('discarded')
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Context manager around acquire()/release()."""
+        connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except Exception:
+            discard = not self._is_healthy(connection)
+            raise
+        finally:
+            self.release(connection, discard)
+
+    def stats(self):
+        """Return the pool metrics together with the current pool occupancy."""
+        with self._lock:
+            return dict(self.metrics, in_use=self._in_use, idle=len(self._idle), max_size=self.max_size)
+
+    def close_idle(self):
+        """Close every idle connection, e.g. before the process exits."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+# Chart width assumed when capping points per trace; one point per pixel is the most a browser can show
+CHART_WIDTH_PX = 1200
+POINTS_PER_PIXEL = 1
+
+
+def max_points(width_px=CHART_WIDTH_PX):
+    return int(width_px * POINTS_PER_PIXEL)
+
+
+def _x_values(index):
+    """Numeric x coordinates for a (datetime) index."""
+    if isinstance(index, pd.DatetimeIndex):
+        return np.asarray((index - index[0]).total_seconds(), dtype=float)
+    return np.asarray(index, dtype=float)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: positions of n_out points that keep the shape of the line."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # First and last points are always kept; the rest is split into n_out - 2 buckets
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(int), n)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_start, next_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Keep the point spanning the largest triangle with the previous pick and the next bucket's mean
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, n_out):
+    """Positions of the minimum and maximum of each of n_out // 2 buckets, in order."""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(int)
+    selected = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        bucket = y[start:end]
+        if end <= start or np.all(np.isnan(bucket)):
+            continue
+        selected += sorted({start + int(np.nanargmin(bucket)), start + int(np.nanargmax(bucket))})
+    return np.asarray(selected, dtype=int)
+
+
+def downsample_line(series, n_out=None):
+    """Reduce a line series to at most n_out points with LTTB, ignoring NaN warm-up values."""
+    n_out = n_out or max_points()
+    series = series[series.notna()]
+    if len(series) <= n_out:
+        return series
+    values = series.to_numpy(dtype=float)
+    # LTTB keeps the shape but not necessarily the extremes, so pin the global min and max as well
+    positions = lttb_indices(_x_values(series.index), values, n_out - 2)
+    positions = np.union1d(positions, [int(np.argmin(values)), int(np.argmax(values))])
+    return series.iloc[positions]
+
+
+def downsample_bars(series, n_out=None):
+    """Reduce a bar series (volume, histogram) to the min and max bar of each bucket."""
+    n_out = n_out or max_points()
+    if len(series) <= n_out:
+        return series
+    return series.iloc[minmax_indices(series.to_numpy(dtype=float), n_out)]
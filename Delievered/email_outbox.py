@@ -0,0 +1,267 @@
+import os
+import time
+import sqlite3
+import smtplib
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+import streamlit as st
+from perf import span
+
+logger = logging.getLogger(__name__)
+
+# Durable queue of outgoing mail, kept next to the app
+OUTBOX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.outbox.sqlite3')
+
+BATCH_SIZE       = 20     # messages sent per session before the queue is polled again
+MAX_ATTEMPTS     = 8      # attempts before a message is marked as failed
+BASE_BACKOFF     = 2      # seconds, doubled for every failed attempt
+MAX_BACKOFF      = 15 * 60
+SESSION_IDLE     = 60     # seconds an unused SMTP session is kept open
+NOOP_AFTER       = 5      # idle seconds after which a session is checked with NOOP before reuse
+LATENCY_SAMPLES  = 500    # recent enqueue-to-sent latencies kept for the metrics
+
+
+class EmailOutbox:
+    """SQLite-backed outbox drained by a background worker over long-lived SMTP sessions."""
+
+    def __init__(self, smtp_factory, sender, password=None, path=OUTBOX_PATH,
+                 batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS, plaintext=False):
+        # smtp_factory: zero-argument callable returning a connected smtplib.SMTP
+        # plaintext: skip STARTTLS and login; only for the local stand-in server (local_smtp.py)
+        self.smtp_factory = smtp_factory
+        self.sender = sender
+        self.password = password
+        self.plaintext = plaintext
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._smtp = None
+        self._smtp_used_at = 0.0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.counters = {'enqueued': 0, 'sent': 0, 'failed': 0, 'retries': 0, 'sessions_opened': 0}
+
+        with self._db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                    to_email        TEXT NOT NULL,
+                    subject         TEXT NOT NULL,
+                    body            TEXT NOT NULL,
+                    enqueued_at     REAL NOT NULL,
+                    next_attempt_at REAL NOT NULL,
+                    attempts        INTEGER NOT NULL DEFAULT 0,
+                    status          TEXT NOT NULL DEFAULT 'pending',
+                    last_error      TEXT
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS ix_outbox_due ON outbox (status, next_attempt_at)")
+
+    @contextmanager
+    def _db(self):
+        """Open the outbox database for one transaction."""
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def enqueue(self, to_email, subject, body):
+        """Persist a message for delivery and wake the worker; returns immediately."""
+        now = time.time()
+        with self._db_lock, self._db() as db:
+            db.execute(
+                "INSERT INTO outbox (to_email, subject, body, enqueued_at, next_attempt_at) VALUES (?, ?, ?, ?, ?)",
+                (to_email, subject, body, now, now),
+            )
+            self.counters['enqueued'] += 1
+        self._wakeup.set()
+
+    def start(self):
+        """Start the background worker (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._close_session()
+
+    def _due(self):
+        with self._db_lock, self._db() as db:
+            return db.execute(
+                "SELECT id, to_email, subject, body, enqueued_at, attempts FROM outbox "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (time.time(), self.batch_size),
+            ).fetchall()
+
+    def _seconds_until_next(self):
+        with self._db_lock, self._db() as db:
+            row = db.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'").fetchone()
+        if row[0] is None:
+            return None
+        return max(row[0] - time.time(), 0.0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = self._due()
+                if batch:
+                    self._send_batch(batch)
+                    continue
+            except Exception as e:
+                logger.exception("Outbox worker error: %s", e)
+
+            if self._smtp is not None and time.monotonic() - self._smtp_used_at > SESSION_IDLE:
+                self._close_session()
+
+            wait = self._seconds_until_next()
+            wait = SESSION_IDLE if wait is None else min(wait, SESSION_IDLE)
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def _session(self):
+        """Return a live SMTP session, reusing the previous one when it still answers NOOP."""
+        if self._smtp is not None and time.monotonic() - self._smtp_used_at < NOOP_AFTER:
+            return self._smtp
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._close_session()
+
+        with span('smtp.connect'):
+            smtp = self.smtp_factory()
+            try:
+                smtp.ehlo()
+                if not self.plaintext:
+                    # Never send credentials or mail in the clear, nor unauthenticated
+                    if not smtp.has_extn('starttls'):
+                        raise smtplib.SMTPNotSupportedError("Mail server does not offer STARTTLS")
+                    smtp.starttls()
+                    smtp.ehlo()
+                    if not smtp.has_extn('auth'):
+                        raise smtplib.SMTPNotSupportedError("Mail server does not offer AUTH")
+                    smtp.login(self.sender, self.password)
+            except Exception:
+                smtp.close()
+                raise
+
+        self._smtp = smtp
+        self._smtp_used_at = time.monotonic()
+        self.counters['sessions_opened'] += 1
+        return smtp
+
+    def _close_session(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _message(self, to_email, subject, body):
+        msg = MIMEMultipart()
+        msg["Subject"] = subject
+        msg["From"] = self.sender
+        msg["To"] = to_email
+        msg.attach(MIMEText(body, "plain"))
+        return msg.as_string()
+
+    def _send_batch(self, batch):
+        """Send several queued messages over one SMTP session."""
+        for position, (msg_id, to_email, subject, body, enqueued_at, attempts) in enumerate(batch):
+            smtp = None
+            try:
+                smtp = self._session()
+                with span('smtp.sendmail'):
+                    smtp.sendmail(self.sender, [to_email], self._message(to_email, subject, body))
+            except smtplib.SMTPRecipientsRefused as e:
+                # 5xx for the recipient is final, 4xx (e.g. mailbox busy, greylisting) is retried
+                if all(code >= 500 for code, _ in e.recipients.values()):
+                    self._mark_failed(msg_id, e)
+                else:
+                    self._reschedule(msg_id, attempts + 1, e)
+                continue
+            except (smtplib.SMTPException, OSError) as e:
+                # A response error once the session is up (not SMTPConnectError or a failed login) concerns this message only
+                if smtp is not None and isinstance(e, smtplib.SMTPResponseException):
+                    # sendmail has reset the session; 5xx is final, 4xx is retried
+                    if e.smtp_code >= 500:
+                        self._mark_failed(msg_id, e)
+                    else:
+                        self._reschedule(msg_id, attempts + 1, e)
+                    continue
+                # Connection-level problem: back off this message and everything after it
+                self._close_session()
+                for retry_id, *_, retry_attempts in batch[position:]:
+                    self._reschedule(retry_id, retry_attempts + 1, e)
+                return
+
+            self._smtp_used_at = time.monotonic()
+            with self._db_lock, self._db() as db:
+                db.execute("DELETE FROM outbox WHERE id = ?", (msg_id,))
+            self.counters['sent'] += 1
+            self._latencies.append(time.time() - enqueued_at)
+
+    def _reschedule(self, msg_id, attempts, error):
+        if attempts >= self.max_attempts:
+            self._mark_failed(msg_id, error)
+            return
+        delay = min(BASE_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+        with self._db_lock, self._db() as db:
+            db.execute(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (attempts, time.time() + delay, str(error), msg_id),
+            )
+        self.counters['retries'] += 1
+
+    def _mark_failed(self, msg_id, error):
+        logger.warning("Giving up on outbox message %s: %s", msg_id, error)
+        with self._db_lock, self._db() as db:
+            db.execute("UPDATE outbox SET status = 'failed', last_error = ? WHERE id = ?", (str(error), msg_id))
+        self.counters['failed'] += 1
+
+    def metrics(self):
+        """Queue depth, delivery counters and enqueue-to-sent latency percentiles (seconds)."""
+        with self._db_lock, self._db() as db:
+            depth = db.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+            failed = db.execute("SELECT COUNT(*) FROM outbox WHERE status = 'failed'").fetchone()[0]
+
+        latencies = sorted(self._latencies)
+
+        def percentile(q):
+            if not latencies:
+                return None
+            return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+        return dict(self.counters, queue_depth=depth, failed_in_queue=failed,
+                    latency_p50=percentile(0.50), latency_p95=percentile(0.95))
+
+
+@st.cache_resource
+def get_outbox():
+    """Return the outbox shared by every session of this server, with its worker running."""
+    from smtp_connections import SMTP_SERVER, SMTP_PORT, EMAIL_ADDRESS, EMAIL_PASSWORD
+
+    def smtp_factory():
+        return smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+
+    return EmailOutbox(smtp_factory, EMAIL_ADDRESS, EMAIL_PASSWORD).start()
@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+import streamlit as st
+
+# Finished figures kept before the least recently used one is dropped
+MAX_ENTRIES = 64
+
+
+class FigureCache:
+    """LRU of finished chart figures keyed on everything they are drawn from.
+
+    Keys are (ticker, interval, start, end, chart, params, data version). The data version comes from
+    the price store and changes whenever the bars of that ticker and interval change, so a figure built
+    from old data is never served; it is dropped as soon as a figure for the same ticker, interval and
+    newer data is stored.
+    Entries hold the Figure itself (or a building block of one), so showing it again costs a lookup.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'invalidated': 0, 'evictions': 0}
+
+    @staticmethod
+    def make_key(ticker, interval, start, end, chart, params, version):
+        """Build a hashable cache key; params is a dict of everything else the figure depends on."""
+        params = tuple(sorted((name, repr(value)) for name, value in params.items()))
+        return (ticker.upper(), interval, str(start), str(end), chart, params, version)
+
+    def _lookup(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return self._entries[key]
+
+        entry = build()
+
+        with self._lock:
+            self.counters['misses'] += 1
+            # Figures of this ticker and interval built from any other data version are stale now
+            series, version = key[:2], key[-1]
+            for stale in [k for k in self._entries if k[:2] == series and k[-1] != version]:
+                del self._entries[stale]
+                self.counters['invalidated'] += 1
+
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+        return entry
+
+    def get_figure(self, key, build):
+        """Return the Figure for key, ready for st.plotly_chart, calling build() only on a miss."""
+        return self._lookup(key, build)
+
+    def get(self, key, build):
+        """Cache a building block of a figure (e.g. one panel's series) under the same keys and invalidation."""
+        return self._lookup(key, build)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters, entries=len(self._entries))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+@st.cache_resource
+def get_figure_cache():
+    """Return the figure cache shared by every session of this server."""
+    return FigureCache()
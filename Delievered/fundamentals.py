@@ -0,0 +1,185 @@
+import os
+import time
+import gzip
+import pickle
+import logging
+import datetime
+import threading
+import streamlit as st
+from providers import get_provider
+from upstream import background, priority_lock, UpstreamUnavailable
+from ticker_registry import get_registry, UNIVERSE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Statements live next to the app, one compressed file per ticker and statement
+FUNDAMENTALS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.fundamentals')
+
+STATEMENTS = ['financials', 'quarterly_financials']
+# Days after a report before the provider reliably has the new statements
+FILING_LAG_DAYS = 3
+# Recheck daily while the calendar has no upcoming report (or it is unknown)
+RECHECK_DAYS = 1
+# Never trust a stored statement for longer than this, whatever the calendar says
+MAX_AGE_DAYS = 120
+# Local hour at which the whole universe is refreshed
+NIGHTLY_HOUR = 2
+
+
+def valid_until(fetched_on, earnings_dates):
+    """Date after which statements fetched on fetched_on may be outdated, from the earnings calendar."""
+    upcoming = [date for date in earnings_dates if date >= fetched_on]
+    if upcoming:
+        until = min(upcoming) + datetime.timedelta(days=FILING_LAG_DAYS)
+    else:
+        until = fetched_on + datetime.timedelta(days=RECHECK_DAYS)
+    return min(until, fetched_on + datetime.timedelta(days=MAX_AGE_DAYS))
+
+
+class FundamentalsStore:
+    """Income statements kept on disk until the company's next earnings report, not for a fixed TTL."""
+
+    def __init__(self, provider, root=FUNDAMENTALS_DIR):
+        self.provider = provider
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self._memory = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.counters = {'hits': 0, 'refreshes': 0, 'errors': 0, 'empty': 0}
+
+    def _count(self, name):
+        with self._locks_guard:
+            self.counters[name] += 1
+
+    def _lock(self, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _path(self, ticker, statement):
+        return os.path.join(self.root, ticker.upper(), f'{statement}.pkl.gz')
+
+    def _read(self, ticker, statement):
+        key = (ticker.upper(), statement)
+        if key in self._memory:
+            return self._memory[key]
+        try:
+            with gzip.open(self._path(ticker, statement), 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        self._memory[key] = entry
+        return entry
+
+    def _write(self, ticker, statement, entry):
+        path = self._path(ticker, statement)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path + '.tmp', 'wb') as f:
+            pickle.dump(entry, f)
+        os.replace(path + '.tmp', path)
+        self._memory[(ticker.upper(), statement)] = entry
+
+    def is_fresh(self, ticker, statement, today=None):
+        entry = self._read(ticker, statement)
+        return entry is not None and (today or datetime.date.today()) < entry['valid_until']
+
+    def refresh(self, ticker, statements=STATEMENTS):
+        """Download statements and the earnings calendar, and store them until the next report."""
+        today = datetime.date.today()
+        try:
+            earnings_dates = self.provider.earnings_dates(ticker)
+        except Exception as e:
+            logger.warning("No earnings calendar for %s: %s", ticker, e)
+            earnings_dates = []
+
+        until = valid_until(today, earnings_dates)
+        for statement in statements:
+            value = getattr(self.provider, statement)(ticker)
+            entry = {'value': value, 'fetched_at': time.time(), 'earnings_dates': earnings_dates, 'valid_until': until}
+            if value is None or value.empty:
+                # yfinance answers a throttled or failed call with an empty frame: recheck soon, and
+                # keep serving statements we already have rather than replacing them with nothing
+                stored = self._read(ticker, statement)
+                if stored is not None and stored['value'] is not None and not stored['value'].empty:
+                    entry = dict(stored)
+                entry['valid_until'] = today + datetime.timedelta(days=RECHECK_DAYS)
+                self._count('empty')
+            self._write(ticker, statement, entry)
+        self._count('refreshes')
+
+    def get(self, ticker, statement):
+        """Return a stored statement, downloading it only once the earnings calendar says it may be outdated."""
+        with priority_lock(self._lock(ticker), self.provider, ticker):
+            if self.is_fresh(ticker, statement):
+                self._count('hits')
+                return self._read(ticker, statement)['value']
+            try:
+                # Statements share the calendar and expiry, so refresh them together
+                self.refresh(ticker)
+            except Exception as e:
+                self._count('errors')
+                stale = self._read(ticker, statement)
+                if stale is None:
+                    raise
+                # An outdated statement beats none while the provider is failing
+                logger.warning("Serving stored %s for %s after refresh failed: %s", statement, ticker, e)
+            return self._read(ticker, statement)['value']
+
+    def refresh_universe(self, tickers, horizon_days=1):
+        """Refresh every ticker whose statements expire within horizon_days; return the refreshed ones."""
+        soon = datetime.date.today() + datetime.timedelta(days=horizon_days)
+        refreshed = []
+        for ticker in tickers:
+            if all(self.is_fresh(ticker, statement, soon) for statement in STATEMENTS):
+                continue
+            with self._lock(ticker):
+                try:
+                    self.refresh(ticker)
+                    refreshed.append(ticker)
+                except UpstreamUnavailable as e:
+                    # The provider keeps failing: the rest of the universe waits for the next run
+                    logger.warning("Nightly fundamentals refresh stopped at %s: %s", ticker, e)
+                    break
+                except Exception as e:
+                    self._count('errors')
+                    logger.warning("Nightly fundamentals refresh of %s failed: %s", ticker, e)
+        return refreshed
+
+    def stats(self):
+        return dict(self.counters, tickers=len({ticker for ticker, _ in self._memory}))
+
+
+@st.cache_resource
+def get_fundamentals():
+    """Return the fundamentals store shared by every session of this server."""
+    provider = get_provider()
+    return FundamentalsStore(provider, os.path.join(FUNDAMENTALS_DIR, provider.namespace))
+
+
+def _seconds_until(hour, now=None):
+    now = now or datetime.datetime.now()
+    target = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += datetime.timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def _refresh_nightly(store, registry):
+    while True:
+        try:
+            tickers = registry.symbols()
+            with background():
+                refreshed = store.refresh_universe(tickers)
+            logger.info("Fundamentals refresh updated %d of %d tickers", len(refreshed), len(tickers))
+        except Exception as e:
+            logger.exception("Fundamentals refresh failed: %s", e)
+        time.sleep(_seconds_until(NIGHTLY_HOUR))
+
+
+@st.cache_resource
+def start_fundamentals_refresh(path=UNIVERSE_PATH):
+    """Fill in missing statements for the universe now, then refresh expiring ones every night."""
+    thread = threading.Thread(target=_refresh_nightly, args=(get_fundamentals(), get_registry(path)),
+                              name='fundamentals-refresh', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,122 @@
+"""Minimal local SMTP server standing in for the real mail server in development and tests.
+
+It speaks just enough SMTP for smtplib (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT),
+advertises neither STARTTLS nor AUTH, and keeps every accepted message in memory.
+
+The app's outbox refuses to send without STARTTLS and login, so it cannot be pointed at this
+server through the secrets; build one with server.outbox() instead, the only plaintext outbox:
+
+    with LocalSMTPServer() as server:
+        outbox = server.outbox('app@localhost', path='/tmp/outbox.sqlite3').start()
+
+or run it on its own to watch what a client sends:
+
+    python local_smtp.py --port 1025
+"""
+import argparse
+import smtplib
+import threading
+import socketserver
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        sender, recipients = None, []
+        self.reply("220 localhost local SMTP stand-in")
+
+        for raw in self.rfile:
+            command = raw.decode(errors='replace').rstrip("\r\n")
+            verb = command[:4].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                sender, recipients = command.split(":", 1)[1].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data_line in self.rfile:
+                    data_line = data_line.decode(errors='replace').rstrip("\r\n")
+                    if data_line == ".":
+                        break
+                    lines.append(data_line[1:] if data_line.startswith("..") else data_line)
+                with server.lock:
+                    server.messages.append({'from': sender, 'to': recipients, 'data': "\n".join(lines)})
+                sender, recipients = None, []
+                self.reply("250 OK: queued")
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Threaded SMTP stand-in; messages accepted so far are in .messages."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='local-smtp', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def outbox(self, sender, **kwargs):
+        """An EmailOutbox delivering to this server, without STARTTLS or login."""
+        from email_outbox import EmailOutbox
+
+        host, port = self.server_address
+        return EmailOutbox(lambda: smtplib.SMTP(host, port, timeout=30), sender, plaintext=True, **kwargs)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SMTP stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+
+    with LocalSMTPServer(args.host, args.port) as server:
+        print(f"Listening on {args.host}:{server.port}, Ctrl+C to stop")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        for message in server.messages:
+            print(message['from'], '->', ', '.join(message['to']))
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+
+# Threads shared by every session's page loads
+LOAD_WORKERS = 16
+# Seconds a page waits for each dataset before showing it as unavailable
+LOAD_TIMEOUTS = {
+    'history': 30,
+    'info': 10,
+    'recommendations': 10,
+    'financials': 15,
+    'quarterly_financials': 15,
+}
+DEFAULT_TIMEOUT = 15
+# Seconds to wait for fresh data when a stored copy can be shown instead
+STALE_WAIT = 2
+
+
+@st.cache_resource
+def get_load_pool():
+    """Return the thread pool page loads run on, shared by every session of this server."""
+    return ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix='page-load')
+
+
+class PageLoads:
+    """Datasets of one page requested all at once; each is awaited only where it is shown.
+
+    Loaders run on worker threads, so they must not call Streamlit; pass them the shared
+    store/cache objects rather than looking those up inside the loader.
+    """
+
+    def __init__(self, loaders, pool=None):
+        pool = pool or get_load_pool()
+        self._futures = {name: pool.submit(loader) for name, loader in loaders.items()}
+
+    def __contains__(self, name):
+        return name in self._futures
+
+    def result(self, name, timeout=None):
+        """Wait for one dataset; raise TimeoutError if it is not ready within its timeout.
+
+        The load keeps running after a timeout and lands in the shared caches for the next rerun.
+        """
+        timeout = LOAD_TIMEOUTS.get(name, DEFAULT_TIMEOUT) if timeout is None else timeout
+        return self._futures[name].result(timeout=timeout)
+
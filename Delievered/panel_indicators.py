@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Indicators from utils.py computed for a whole (dates x tickers) price panel in one
+# vectorized pass. Missing prices (a ticker not listed yet, or not trading on a date
+# other tickers traded) are handled like the per-ticker path, which simply never
+# sees those rows: each column is computed over its own observed prices and the
+# result is NaN wherever the price is missing.
+
+
+def price_panel(store, tickers, start, end, column='Close'):
+    """Align one price column of several tickers from the price store into (dates, tickers, values)."""
+    series = {}
+    for ticker in tickers:
+        history = store.get_history(ticker, start, end)
+        if not history.empty:
+            series[ticker] = history[column]
+
+    if not series:
+        return pd.DatetimeIndex([]), [], np.empty((0, 0))
+    panel = pd.concat(series, axis=1).sort_index()
+    return panel.index, list(panel.columns), panel.to_numpy(dtype=float)
+
+
+def _compact(prices):
+    """Move every column's observed prices to the top, keeping their order."""
+    valid = ~np.isnan(prices)
+    order = np.argsort(~valid, axis=0, kind='stable')
+    return np.take_along_axis(prices, order, axis=0), order, valid
+
+
+def _expand(values, order, valid):
+    """Undo _compact: put results back on their dates and blank out missing prices."""
+    out = np.empty_like(values)
+    np.put_along_axis(out, order, values, axis=0)
+    out[~valid] = np.nan
+    return out
+
+
+def _rolling(values, window, reducer):
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        windows = sliding_window_view(values, window, axis=0)
+        out[window - 1:] = reducer(windows)
+    return out
+
+
+def _ewm(values, span):
+    """ewm(span=span, adjust=False).mean() down every column of a compacted panel."""
+    alpha = 2.0 / (span + 1.0)
+    old_wt = 1.0 - alpha
+    out = np.empty_like(values)
+    if len(values) == 0:
+        return out
+    weighted = values[0].copy()
+    out[0] = weighted
+
+    for i in range(1, len(values)):
+        cur = values[i]
+        # Same update as pandas, which leaves the average untouched when it equals the price
+        update = (weighted == weighted) & (cur == cur) & (weighted != cur)
+        blended = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        weighted = np.where(update, blended, weighted)
+        weighted = np.where((weighted != weighted) & (cur == cur), cur, weighted)
+        out[i] = weighted
+    return out
+
+
+def panel_bollinger_bands(prices, window=20, num_std=2):
+    """calculate_bollinger_bands for every column: returns (rolling_mean, upper_band, lower_band)."""
+    compact, order, valid = _compact(np.asarray(prices, dtype=float))
+    rolling_mean = _rolling(compact, window, lambda w: w.mean(axis=-1))
+    rolling_std = _rolling(compact, window, lambda w: w.std(axis=-1, ddof=1))
+    upper_band = rolling_mean + (rolling_std * num_std)
+    lower_band = rolling_mean - (rolling_std * num_std)
+    return tuple(_expand(band, order, valid) for band in (rolling_mean, upper_band, lower_band))
+
+
+def panel_macd(prices, short_window=12, long_window=26, signal_window=9):
+    """calculate_macd for every column: returns (macd_line, signal_line, macd_histogram)."""
+    compact, order, valid = _compact(np.asarray(prices, dtype=float))
+    macd_line = _ewm(compact, short_window) - _ewm(compact, long_window)
+    signal_line = _ewm(macd_line, signal_window)
+    macd_histogram = macd_line - signal_line
+    return tuple(_expand(line, order, valid) for line in (macd_line, signal_line, macd_histogram))
+
+
+def panel_rsi(prices, periods=14):
+    """calculate_rsi for every column."""
+    compact, order, valid = _compact(np.asarray(prices, dtype=float))
+    delta = np.full(compact.shape, np.nan)
+    delta[1:] = np.diff(compact, axis=0)
+
+    gain = _rolling(np.where(delta > 0, delta, 0.0), periods, lambda w: w.mean(axis=-1))
+    loss = _rolling(np.where(delta < 0, -delta, 0.0), periods, lambda w: w.mean(axis=-1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = gain / loss
+        rsi = 100 - (100 / (1 + rs))
+    return _expand(rsi, order, valid)
@@ -0,0 +1,148 @@
+"""Lightweight timing spans for the app's hot paths.
+
+    with span('fetch_ticker_data'):
+        ...
+
+    @timed('show_stock_info')
+    def show_stock_info(self): ...
+
+Durations are aggregated per section into a Prometheus-style histogram plus a window of recent
+samples for p50/p95/p99. Set PERF_JSON_LOG=1 to also log every span as one JSON line.
+"""
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Recent samples kept per section for percentiles
+WINDOW = 2048
+METRIC = 'stock_app_section_seconds'
+
+
+class _Section:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.recent = deque(maxlen=WINDOW)
+
+
+class PerfRecorder:
+    """Thread-safe per-section duration histograms."""
+
+    def __init__(self, json_log=None):
+        self.json_log = os.environ.get('PERF_JSON_LOG') == '1' if json_log is None else json_log
+        self._sections = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, error=False):
+        with self._lock:
+            section = self._sections.get(name)
+            if section is None:
+                section = self._sections[name] = _Section()
+            section.buckets[bisect_left(BUCKETS, seconds)] += 1
+            section.count += 1
+            section.total += seconds
+            section.errors += error
+            section.recent.append(seconds)
+        if self.json_log:
+            logger.info(json.dumps({'section': name, 'seconds': round(seconds, 6), 'error': error}))
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - started, error)
+
+    def summary(self):
+        """Return {section: count, errors, mean, p50, p95, p99} (seconds), slowest p95 first."""
+        with self._lock:
+            sections = {name: (s.count, s.errors, s.total, sorted(s.recent)) for name, s in self._sections.items()}
+
+        def percentile(samples, q):
+            return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+        rows = {}
+        for name, (count, errors, total, samples) in sections.items():
+            rows[name] = {
+                'count': count,
+                'errors': errors,
+                'mean': total / count,
+                'p50': percentile(samples, 0.50),
+                'p95': percentile(samples, 0.95),
+                'p99': percentile(samples, 0.99),
+            }
+        return dict(sorted(rows.items(), key=lambda item: -item[1]['p95']))
+
+    def prometheus(self):
+        """Render every section as a Prometheus text-format histogram."""
+        lines = [f'# HELP {METRIC} Time spent per app section.', f'# TYPE {METRIC} histogram']
+        with self._lock:
+            for name, section in sorted(self._sections.items()):
+                label = name.replace('\\', '\\\\').replace('"', '\\"')
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), section.buckets):
+                    cumulative += count
+                    lines.append(f'{METRIC}_bucket{{section="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC}_sum{{section="{label}"}} {section.total}')
+                lines.append(f'{METRIC}_count{{section="{label}"}} {section.count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._sections.clear()
+
+
+def prometheus_gauge(name, values):
+    """Render the numbers of a (nested) stats dict as one Prometheus gauge labelled by stat."""
+    metric = f'stock_app_{name}'
+    lines = [f'# TYPE {metric} gauge']
+
+    def flatten(prefix, stats):
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                flatten(f'{prefix}{key}.', value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f'{metric}{{stat="{prefix}{key}"}} {value}')
+
+    flatten('', values)
+    return '\n'.join(lines) + '\n'
+
+
+@st.cache_resource
+def get_perf():
+    """Return the recorder shared by every session of this server."""
+    return PerfRecorder()
+
+
+def span(name):
+    """Time a block under a section name."""
+    return get_perf().span(name)
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
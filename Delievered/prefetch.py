@@ -0,0 +1,124 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from price_store import get_price_store, DAILY
+from data_cache import get_data_cache
+from fundamentals import get_fundamentals, STATEMENTS
+from providers import get_provider
+from upstream import background
+
+logger = logging.getLogger(__name__)
+
+# Threads shared by every user's prefetches
+PREFETCH_WORKERS = 4
+# Tickers one user may have queued or loading at any time
+USER_BUDGET = 4
+# Recently viewed tickers remembered per session
+RECENT_TICKERS = 5
+# Ticker fields warmed alongside the price history, most needed first (then the statements)
+FIELDS = ['info', 'recommendations']
+
+
+def prefetch_candidates(tickers, selected, recent=()):
+    """Next and previous tickers in the list, then the recently viewed ones (most recent first)."""
+    candidates = []
+    if selected in tickers:
+        position = tickers.index(selected)
+        if position + 1 < len(tickers):
+            candidates.append(tickers[position + 1])
+        if position > 0:
+            candidates.append(tickers[position - 1])
+    candidates += [ticker for ticker in reversed(recent) if ticker != selected]
+    return list(dict.fromkeys(candidates))
+
+
+class Prefetcher:
+    """Speculatively load tickers a user is likely to open next into the shared price store and data cache.
+
+    Every user gets a budget of queued/running tickers. A new request from the same user cancels
+    whatever of their previous request is no longer wanted: queued tickers are dropped, running
+    ones stop before their next step.
+    """
+
+    def __init__(self, store, cache, fundamentals, provider, workers=PREFETCH_WORKERS, budget=USER_BUDGET):
+        self.store = store
+        self.cache = cache
+        self.fundamentals = fundamentals
+        self.provider = provider
+        self.budget = budget
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        # user -> {ticker: (future, cancel event)}
+        self._jobs = {}
+        self.counters = {'submitted': 0, 'completed': 0, 'cancelled': 0, 'warm': 0, 'over_budget': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _is_warm(self, ticker, start, end, interval):
+        coverage = self.store.coverage(ticker, interval)
+        history_warm = coverage is not None and coverage[0] <= start and coverage[1] >= end
+        return (history_warm and all(self.cache.contains(ticker, field) for field in FIELDS)
+                and all(self.fundamentals.is_fresh(ticker, statement) for statement in STATEMENTS))
+
+    def _load(self, ticker, start, end, interval, cancelled):
+        # Checked here rather than in prefetch(): the store's ticker lock may be held by a running fetch
+        if self._is_warm(ticker, start, end, interval):
+            self._count('warm')
+            return
+
+        steps = [lambda: self.cache.get(ticker, 'info', lambda: self.provider.info(ticker)),
+                 lambda: self.store.get_history(ticker, start, end, interval)]
+        steps += [lambda field=field: self.cache.get(ticker, field, lambda: getattr(self.provider, field)(ticker))
+                  for field in FIELDS[1:]]
+        steps += [lambda: self.fundamentals.get(ticker, STATEMENTS[0])]
+        try:
+            for step in steps:
+                if cancelled.is_set():
+                    self._count('cancelled')
+                    return
+                # Speculative work never holds up a page load for the upstream rate limit
+                with background():
+                    step()
+            self._count('completed')
+        except Exception as e:
+            self._count('errors')
+            logger.warning("Prefetch of %s failed: %s", ticker, e)
+
+    def prefetch(self, user, tickers, start, end, interval=DAILY):
+        """Replace the user's pending prefetches with tickers (in priority order), within their budget."""
+        with self._lock:
+            jobs = self._jobs.setdefault(user, {})
+            for ticker in [ticker for ticker, (future, _) in jobs.items() if future.done()]:
+                del jobs[ticker]
+
+            # The user moved on: stop what they no longer need
+            for ticker in [ticker for ticker in jobs if ticker not in tickers]:
+                future, cancelled = jobs.pop(ticker)
+                cancelled.set()
+                if future.cancel():
+                    self.counters['cancelled'] += 1
+
+            for ticker in tickers:
+                if ticker in jobs:
+                    continue
+                if len(jobs) >= self.budget:
+                    self.counters['over_budget'] += 1
+                    break
+                cancelled = threading.Event()
+                future = self._pool.submit(self._load, ticker, start, end, interval, cancelled)
+                jobs[ticker] = (future, cancelled)
+                self.counters['submitted'] += 1
+
+    def stats(self):
+        with self._lock:
+            pending = sum(not future.done() for jobs in self._jobs.values() for future, _ in jobs.values())
+        return dict(self.counters, pending=pending)
+
+
+@st.cache_resource
+def get_prefetcher():
+    """Return the prefetcher shared by every session of this server."""
+    return Prefetcher(get_price_store(), get_data_cache(), get_fundamentals(), get_provider())
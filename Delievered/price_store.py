@@ -0,0 +1,309 @@
+import os
+import json
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import streamlit as st
+from providers import get_provider
+from upstream import carry_priority, priority_lock
+
+# Price partitions live next to the app, one Parquet file per ticker
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.price_store')
+
+# Days of already stored bars re-requested with the first tail fetch of each day, used to
+# detect split/dividend re-adjustments of the history we already hold
+OVERLAP_DAYS = 7
+
+DAILY = '1d'
+# Intraday interval -> (days per provider request, days back the provider serves at all)
+INTRADAY_LIMITS = {
+    '1h': (365, 729),
+    '15m': (30, 59),
+    '5m': (30, 59),
+    '1m': (7, 29),
+}
+INTERVALS = [DAILY] + list(INTRADAY_LIMITS)
+# Windows of one intraday range requested at the same time
+FETCH_WORKERS = 4
+
+logger = logging.getLogger(__name__)
+
+
+def earliest_start(interval, today=None):
+    """First date the provider still serves bars of this interval for, or None when unlimited."""
+    if interval not in INTRADAY_LIMITS:
+        return None
+    today = today or datetime.date.today()
+    return today - datetime.timedelta(days=INTRADAY_LIMITS[interval][1])
+
+
+def fetch_windows(start, end, interval):
+    """Split [start, end) into the consecutive date windows the provider accepts for one interval."""
+    if interval not in INTRADAY_LIMITS:
+        return [(start, end)]
+    step = datetime.timedelta(days=INTRADAY_LIMITS[interval][0])
+    windows = []
+    while start < end:
+        windows.append((start, min(start + step, end)))
+        start += step
+    return windows
+
+
+def compact_bars(frame):
+    """Shrink intraday bars for storage: float32 prices, integer volume and no all-zero action columns."""
+    if frame is None or frame.empty:
+        return frame
+    frame = frame.drop(columns=[c for c in ('Dividends', 'Stock Splits', 'Capital Gains')
+                                if c in frame.columns and not frame[c].any()])
+    prices = [c for c in ('Open', 'High', 'Low', 'Close') if c in frame.columns]
+    frame = frame.astype({c: 'float32' for c in prices})
+    if 'Volume' in frame.columns:
+        frame = frame.astype({'Volume': 'int64'})
+    return frame
+
+
+def _as_date(value):
+    """Normalise a date, datetime or string to a datetime.date."""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+class PriceStore:
+    """Local OHLCV store that only asks the provider for the part of a range it does not hold.
+
+    Every (ticker, interval) pair is its own partition. Daily bars are kept in memory once read;
+    intraday partitions are much larger, so they are stored compacted and read back from Parquet
+    on each request instead of piling up in the process.
+    """
+
+    def __init__(self, root=STORE_DIR, provider=None):
+        self.root = root
+        self.provider = provider or get_provider()
+        os.makedirs(self.root, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        # Daily bars already read or written by this process, keyed by (ticker, interval)
+        self._memory = {}
+        # Data version of every loaded partition, bumped by each write (see version())
+        self._versions = {}
+        # Day each (ticker, interval) was last checked for re-adjustments; later tail fetches that day start at the coverage end
+        self._checked = {}
+
+    def _lock(self, ticker, interval=DAILY):
+        with self._locks_guard:
+            return self._locks.setdefault((ticker, interval), threading.Lock())
+
+    def _paths(self, ticker, interval=DAILY):
+        base = os.path.join(self.root, ticker.upper())
+        if interval != DAILY:
+            base += '@' + interval
+        return base + '.parquet', base + '.json'
+
+    def _load(self, ticker, interval=DAILY):
+        """Read the stored bars and the date range they cover, from memory when possible."""
+        key = (ticker, interval)
+        if key in self._memory:
+            return self._memory[key]
+
+        data_path, meta_path = self._paths(ticker, interval)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        coverage = (_as_date(meta['start']), _as_date(meta['end']))
+        self._versions[key] = meta.get('version', 0)
+        loaded = (pd.read_parquet(data_path), coverage)
+        if interval == DAILY:
+            self._memory[key] = loaded
+        return loaded
+
+    def _save(self, ticker, frame, coverage, interval=DAILY):
+        """Write the bars first and the coverage last, so a crash never over-reports coverage.
+
+        Bars at or after the coverage end (today's, still moving) are not stored.
+        """
+        key = (ticker, interval)
+        data_path, meta_path = self._paths(ticker, interval)
+        if not frame.empty:
+            frame = frame[frame.index < pd.Timestamp(coverage[1]).tz_localize(frame.index.tz)]
+        frame.to_parquet(data_path + '.tmp')
+        os.replace(data_path + '.tmp', data_path)
+
+        version = self._versions.get(key, 0) + 1
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump({'start': coverage[0].isoformat(), 'end': coverage[1].isoformat(), 'version': version}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+        self._versions[key] = version
+        if interval == DAILY:
+            self._memory[key] = (frame, coverage)
+
+    def version(self, ticker, interval=DAILY):
+        """Return a number that changes whenever the bars stored for a ticker change (0 if none are held).
+
+        Never waits for a fetch in progress, so a page can still draw what is stored while one runs.
+        """
+        if (ticker, interval) not in self._versions:
+            self._load(ticker, interval)
+        return self._versions.get((ticker, interval), 0)
+
+    def coverage(self, ticker, interval=DAILY):
+        """Return the (start, end) date range held for a ticker, or None."""
+        with self._lock(ticker, interval):
+            return self._load(ticker, interval)[1]
+
+    def held_until(self, ticker, interval=DAILY):
+        """End of the stored range (exclusive), or None; never waits for a fetch in progress."""
+        key = (ticker, interval)
+        if key in self._memory:
+            return self._memory[key][1][1]
+        try:
+            with open(self._paths(ticker, interval)[1]) as f:
+                return _as_date(json.load(f)['end'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def snapshot(self, ticker, start, end, interval=DAILY):
+        """Stored bars for [start, end) without fetching or waiting for a fetch in progress, or None."""
+        # Files are replaced atomically, so reading them outside the ticker lock is safe
+        frame, coverage = self._load(ticker, interval)
+        if coverage is None:
+            return None
+        return self._slice(frame, _as_date(start), _as_date(end))
+
+    def store_history(self, ticker, frame, start, end, interval=DAILY):
+        """Merge bars downloaded elsewhere (e.g. a batch download) covering [start, end)."""
+        start, end = _as_date(start), _as_date(end)
+        if frame is None or frame.empty:
+            return
+
+        with self._lock(ticker, interval):
+            stored, coverage = self._load(ticker, interval)
+            touches = coverage is not None and start <= coverage[1] and end >= coverage[0]
+
+            if touches and self._overlap_matches(stored, frame):
+                frame = self._merge([stored, frame])
+                coverage = (min(start, coverage[0]), max(end, coverage[1]))
+            else:
+                coverage = (start, end)
+
+            coverage = (coverage[0], min(coverage[1], datetime.date.today()))
+            if coverage[0] < coverage[1]:
+                self._save(ticker, frame, coverage, interval)
+
+    def _fetch_window(self, ticker, start, end, interval):
+        return self.provider.history(ticker, start, end, interval)
+
+    def _fetch(self, ticker, start, end, interval=DAILY):
+        """Download [start, end); intraday ranges are fetched in parallel windows, merged and compacted."""
+        if interval == DAILY:
+            return self._fetch_window(ticker, start, end, interval)
+
+        windows = fetch_windows(start, end, interval)
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            fetch = carry_priority(lambda window: self._fetch_window(ticker, *window, interval))
+            parts = list(pool.map(fetch, windows))
+        logger.info("Fetched %s %s bars in %d windows", ticker, interval, len(windows))
+        return compact_bars(self._merge(parts))
+
+    def get_history(self, ticker, start, end, interval=DAILY):
+        """Return bars of one interval for [start, end), fetching only the missing head/tail of the range.
+
+        Intraday ranges are clipped to what the provider still serves (see INTRADAY_LIMITS).
+        """
+        start, end = _as_date(start), _as_date(end)
+        today = datetime.date.today()
+        horizon = earliest_start(interval, today)
+        if horizon is not None:
+            start = max(start, horizon)
+
+        with priority_lock(self._lock(ticker, interval), self.provider, ticker):
+            frame, coverage = self._load(ticker, interval)
+            if coverage is not None and horizon is not None:
+                # Stored bars older than the provider's horizon can no longer be re-checked or extended
+                coverage = (max(coverage[0], horizon), coverage[1])
+            held = coverage
+
+            if coverage is None or coverage[1] <= coverage[0]:
+                frame = self._fetch(ticker, start, end, interval)
+                coverage = (start, end)
+                self._checked[(ticker, interval)] = today
+            elif start >= coverage[0] and end <= coverage[1]:
+                # Fully held: nothing to fetch and nothing to write back
+                return self._slice(frame, start, end)
+            else:
+                cov_start, cov_end = coverage
+                parts = [frame]
+                try:
+                    if start < cov_start:
+                        parts.append(self._fetch(ticker, start, cov_start, interval))
+
+                    if end > cov_end:
+                        # Re-adjustments happen at most once a day; reruns later that day only fetch the new bars
+                        recheck = self._checked.get((ticker, interval)) != today
+                        tail_start = max(cov_start, cov_end - datetime.timedelta(days=OVERLAP_DAYS)) if recheck else cov_end
+                        tail = self._fetch(ticker, tail_start, end, interval)
+                        if recheck and not self._overlap_matches(frame, tail, cov_end):
+                            # History was re-adjusted upstream, throw away what we hold
+                            parts = [self._fetch(ticker, min(start, cov_start), end, interval)]
+                            held = None
+                        else:
+                            parts.append(tail)
+                        self._checked[(ticker, interval)] = today
+                except Exception as e:
+                    # The bars we hold beat an error page; held_until() tells the caller how old they are
+                    logger.warning("Serving stored %s %s bars up to %s: %s", ticker, interval, cov_end, e)
+                    return self._slice(frame, start, end)
+
+                frame = self._merge(parts)
+                coverage = (min(start, cov_start), max(end, cov_end))
+
+            # Bars for today are still moving, never record them as covered
+            coverage = (coverage[0], min(coverage[1], today))
+            # Re-fetching only today's bars changes nothing stored, so the version stays put
+            if coverage != held and coverage[0] < coverage[1] and not frame.empty:
+                self._save(ticker, frame, coverage, interval)
+
+        return self._slice(frame, start, end)
+
+    def _overlap_matches(self, stored, fetched, until=None):
+        """Check that re-fetched bars agree with the stored ones on the dates both hold (before until, if given)."""
+        common = stored.index.intersection(fetched.index)
+        if until is not None and len(common):
+            # Bars from the coverage end on were still moving when stored
+            common = common[common < pd.Timestamp(until).tz_localize(common.tz)]
+        if len(common) == 0:
+            return True
+        old = stored.loc[common, 'Close']
+        new = fetched.loc[common, 'Close']
+        return bool(((old - new).abs() <= 1e-6 * new.abs().clip(lower=1.0)).all())
+
+    @staticmethod
+    def _merge(parts):
+        parts = [part for part in parts if part is not None and not part.empty]
+        if not parts:
+            return pd.DataFrame()
+        frame = pd.concat(parts)
+        frame = frame[~frame.index.duplicated(keep='last')]
+        return frame.sort_index()
+
+    @staticmethod
+    def _slice(frame, start, end):
+        if frame is None or frame.empty:
+            return pd.DataFrame() if frame is None else frame
+        tz = frame.index.tz
+        lower = pd.Timestamp(start).tz_localize(tz)
+        upper = pd.Timestamp(end).tz_localize(tz)
+        return frame[(frame.index >= lower) & (frame.index < upper)]
+
+
+@st.cache_resource
+def get_price_store():
+    """Return the price store shared by every session of this server."""
+    provider = get_provider()
+    return PriceStore(os.path.join(STORE_DIR, provider.namespace), provider)
@@ -0,0 +1,404 @@
+"""Market data providers: everything the app reads about a ticker goes through one of these.
+
+YahooProvider is the live source. ReplayProvider serves recorded Parquet/JSON fixtures, or
+deterministic synthetic data for tickers without fixtures, with optional injected latency, so the
+app can be run, load-tested and benchmarked without network access:
+
+    MARKET_DATA_PROVIDER=replay MARKET_DATA_LATENCY_MS=50 streamlit run stock_price.py
+
+Record fixtures from the live provider with
+
+    python providers.py record AAPL MSFT --start 2023-01-01 --end 2024-01-01 --intervals 1d 5m
+"""
+import os
+import json
+import time
+import zlib
+import random
+import argparse
+import datetime
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Fixture tree: FIXTURE_DIR/TICKER/{history_<interval>.parquet, info.json, earnings.json, <field>.parquet}
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FIELDS = ['info', 'recommendations', 'financials', 'quarterly_financials']
+
+MARKET_TZ = 'America/New_York'
+
+# Keep-alive connections held per Yahoo host, at least the number of threads calling it at once
+HTTP_POOL_SIZE = 16
+# yf.Ticker handles kept for reuse; a handle caches what it downloaded, so it is only reused briefly
+TICKER_HANDLES = 64
+TICKER_HANDLE_TTL = 60
+
+
+class MarketDataProvider:
+    """History, info, analyst recommendations and financial statements for a ticker."""
+
+    name = None
+    # Subdirectory of the local stores used with this provider, so replayed data never mixes with live data
+    namespace = ''
+
+    def history(self, ticker, start, end, interval='1d'):
+        raise NotImplementedError
+
+    def info(self, ticker):
+        raise NotImplementedError
+
+    def recommendations(self, ticker):
+        raise NotImplementedError
+
+    def financials(self, ticker):
+        raise NotImplementedError
+
+    def quarterly_financials(self, ticker):
+        raise NotImplementedError
+
+    def earnings_dates(self, ticker):
+        """Upcoming (or most recent) earnings report dates, as datetime.date, possibly empty."""
+        raise NotImplementedError
+
+    def download(self, tickers, start, end):
+        """Daily bars for several tickers as {ticker: frame}; providers with a batch endpoint override this."""
+        frames = {}
+        for ticker in tickers:
+            frame = self.history(ticker, start, end)
+            if frame is not None and not frame.empty:
+                frames[ticker] = frame
+        return frames
+
+    def stats(self):
+        """Counters of the provider itself (connections, handles, calls), for the admin panel."""
+        return {}
+
+
+def _pooled_adapter(pool_size):
+    """A requests adapter keeping pool_size keep-alive connections per host."""
+    from requests.adapters import HTTPAdapter
+
+    return HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+
+def connection_stats(adapter):
+    """Connections opened (each one a TCP+TLS handshake) and requests sent through an adapter's pools."""
+    pools = [adapter.poolmanager.pools[key] for key in adapter.poolmanager.pools.keys()]
+    opened = sum(pool.num_connections for pool in pools)
+    sent = sum(pool.num_requests for pool in pools)
+    return {'connections_opened': opened, 'requests_sent': sent, 'connections_reused': max(sent - opened, 0)}
+
+
+class YahooProvider(MarketDataProvider):
+    """Live data from Yahoo Finance through yfinance.
+
+    Every call shares one keep-alive HTTP session, so Yahoo's cookie/crumb and the TCP+TLS connections are set up
+    once per server rather than per rerun, and recently used yf.Ticker handles are reused for a short while.
+    """
+
+    name = 'yahoo'
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, max_handles=TICKER_HANDLES, handle_ttl=TICKER_HANDLE_TTL):
+        import requests
+
+        self.session = requests.Session()
+        self.adapter = _pooled_adapter(pool_size)
+        self.session.mount('https://', self.adapter)
+        self.max_handles = max_handles
+        self.handle_ttl = handle_ttl
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'handles_created': 0, 'handles_reused': 0}
+
+    def _ticker(self, ticker):
+        import yfinance as yf
+
+        key = ticker.upper()
+        now = time.monotonic()
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None and now - handle[0] < self.handle_ttl:
+                self._handles.move_to_end(key)
+                self.counters['handles_reused'] += 1
+                return handle[1]
+
+            # Past its TTL a handle would answer from what it downloaded before, so replace it
+            handle = (now, yf.Ticker(ticker, session=self.session))
+            self._handles[key] = handle
+            self._handles.move_to_end(key)
+            while len(self._handles) > self.max_handles:
+                self._handles.popitem(last=False)
+            self.counters['handles_created'] += 1
+        return handle[1]
+
+    def stats(self):
+        with self._lock:
+            handles = dict(self.counters, handles=len(self._handles))
+        return dict(handles, **connection_stats(self.adapter))
+
+    def history(self, ticker, start, end, interval='1d'):
+        return self._ticker(ticker).history(interval=interval, start=start, end=end)
+
+    def info(self, ticker):
+        return self._ticker(ticker).info
+
+    def recommendations(self, ticker):
+        return self._ticker(ticker).recommendations
+
+    def financials(self, ticker):
+        return self._ticker(ticker).financials
+
+    def quarterly_financials(self, ticker):
+        return self._ticker(ticker).quarterly_financials
+
+    def earnings_dates(self, ticker):
+        calendar = self._ticker(ticker).calendar or {}
+        return [pd.Timestamp(date).date() for date in calendar.get('Earnings Date', [])]
+
+    def download(self, tickers, start, end):
+        """Download daily bars for several tickers in one request, keyed by ticker."""
+        import yfinance as yf
+
+        data = yf.download(
+            tickers,
+            start=start,
+            end=end,
+            interval='1d',
+            group_by='ticker',
+            auto_adjust=True,
+            actions=True,
+            ignore_tz=False,
+            threads=True,
+            progress=False,
+            session=self.session,
+        )
+
+        frames = {}
+        for ticker in tickers:
+            if data.empty or ticker not in data.columns.get_level_values(0):
+                continue
+            frame = data[ticker].dropna(how='all')
+            if not frame.empty:
+                frames[ticker] = frame
+        return frames
+
+
+def _hash_uniform(values, seed):
+    """Deterministic uniform [0, 1) numbers for integer values (splitmix64)."""
+    with np.errstate(over='ignore'):
+        z = values.astype(np.uint64) ^ np.uint64(seed)
+        z = z + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _bar_index(start, end, interval):
+    """Trading-session timestamps in [start, end) for an interval, in the exchange time zone."""
+    days = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+    if interval == '1d':
+        return days.tz_localize(MARKET_TZ)
+
+    freq = {'1h': '60min', '15m': '15min', '5m': '5min', '1m': '1min'}[interval]
+    bars = [pd.date_range(day + pd.Timedelta(hours=9, minutes=30), day + pd.Timedelta(hours=16),
+                          freq=freq, inclusive='left') for day in days]
+    if not bars:
+        return pd.DatetimeIndex([], tz=MARKET_TZ)
+    return bars[0].append(bars[1:]).tz_localize(MARKET_TZ)
+
+
+def synthetic_history(ticker, start, end, interval='1d'):
+    """OHLCV bars that depend only on (ticker, timestamp), so any two windows agree where they overlap."""
+    index = _bar_index(start, end, interval)
+    seed = zlib.crc32(ticker.upper().encode())
+    seconds = index.asi8 // 10 ** 9 if len(index) else np.array([], dtype=np.int64)
+    days = seconds / 86400.0
+
+    base = 20 + seed % 400
+    trend = 0.25 * np.sin(2 * np.pi * days / 365 + seed % 7) + 0.08 * np.sin(2 * np.pi * days / 23 + seed % 5)
+    noise = _hash_uniform(seconds, seed) - 0.5
+    close = base * np.exp(trend + 0.02 * noise)
+    spread = close * 0.01 * _hash_uniform(seconds, seed + 1)
+    open_ = close * (1 + 0.005 * (_hash_uniform(seconds, seed + 2) - 0.5))
+
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': (1e5 + 1e7 * _hash_uniform(seconds, seed + 3)).astype(np.int64),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0,
+    }, index=index)
+
+
+def synthetic_earnings_dates(ticker, today=None):
+    """The next quarterly report date, on a fixed day of each quarter for a ticker."""
+    today = today or datetime.date.today()
+    offset = 20 + zlib.crc32(ticker.upper().encode()) % 40
+    for quarter in range(5):
+        month = ((today.month - 1) // 3 * 3 + 3 * quarter) % 12 + 1
+        year = today.year + ((today.month - 1) // 3 * 3 + 3 * quarter) // 12
+        date = datetime.date(year, month, 1) + datetime.timedelta(days=offset)
+        if date >= today:
+            return [date]
+    return []
+
+
+def synthetic_field(ticker, field):
+    """Stand-in info/recommendations/financials with the shape yfinance returns."""
+    seed = zlib.crc32(ticker.upper().encode())
+    if field == 'info':
+        last = synthetic_history(ticker, datetime.date.today() - datetime.timedelta(days=7), datetime.date.today())
+        close = float(last['Close'].iloc[-1]) if not last.empty else 100.0
+        return {
+            'longName': f'{ticker.upper()} Synthetic Corp.',
+            'longBusinessSummary': f'Replayed data for {ticker.upper()}, generated locally.',
+            'previousClose': round(close, 2),
+            'fiftyTwoWeekHigh': round(close * 1.3, 2),
+            'fiftyTwoWeekLow': round(close * 0.7, 2),
+            'trailingPE': 10 + seed % 30,
+            'beta': round(0.5 + (seed % 100) / 100, 2),
+            'forwardPE': 9 + seed % 25,
+        }
+    if field == 'recommendations':
+        counts = [(seed >> shift) % 12 for shift in (0, 4, 8, 12, 16)]
+        return pd.DataFrame([['0m', *counts], ['-1m', *counts[::-1]]],
+                            columns=['period', 'strongBuy', 'buy', 'hold', 'sell', 'strongSell'])
+
+    periods = 4
+    step = 365 if field == 'financials' else 91
+    columns = [pd.Timestamp(datetime.date.today()) - pd.Timedelta(days=step * (i + 1)) for i in range(periods)]
+    revenue = (1 + seed % 50) * 1e8 * (step / 365)
+    rows = {
+        'Total Revenue': [revenue * (1 - 0.03 * i) for i in range(periods)],
+        'Gross Profit': [revenue * 0.4 * (1 - 0.03 * i) for i in range(periods)],
+        'Net Income': [revenue * 0.1 * (1 - 0.05 * i) for i in range(periods)],
+    }
+    return pd.DataFrame(rows, index=columns).T
+
+
+class ReplayProvider(MarketDataProvider):
+    """Serve fixtures from disk (synthetic data where none are recorded), after an injected delay."""
+
+    name = 'replay'
+    namespace = 'replay'
+
+    def __init__(self, root=FIXTURE_DIR, latency=0.0, jitter=0.0, synthetic=True):
+        self.root = root
+        self.latency = latency
+        self.jitter = jitter
+        self.synthetic = synthetic
+        self.calls = 0
+
+    def stats(self):
+        return {'calls': self.calls}
+
+    def _wait(self):
+        self.calls += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _path(self, ticker, name):
+        return os.path.join(self.root, ticker.upper(), name)
+
+    def history(self, ticker, start, end, interval='1d'):
+        self._wait()
+        path = self._path(ticker, f'history_{interval}.parquet')
+        if os.path.exists(path):
+            frame = pd.read_parquet(path)
+            lower = pd.Timestamp(start).tz_localize(frame.index.tz)
+            upper = pd.Timestamp(end).tz_localize(frame.index.tz)
+            return frame[(frame.index >= lower) & (frame.index < upper)]
+        if self.synthetic:
+            return synthetic_history(ticker, start, end, interval)
+        return pd.DataFrame()
+
+    def _field(self, ticker, field):
+        self._wait()
+        if field == 'info':
+            path = self._path(ticker, 'info.json')
+            if os.path.exists(path):
+                with open(path) as f:
+                    return json.load(f)
+        else:
+            path = self._path(ticker, f'{field}.parquet')
+            if os.path.exists(path):
+                return pd.read_parquet(path)
+        return synthetic_field(ticker, field) if self.synthetic else None
+
+    def info(self, ticker):
+        return self._field(ticker, 'info')
+
+    def recommendations(self, ticker):
+        return self._field(ticker, 'recommendations')
+
+    def financials(self, ticker):
+        return self._field(ticker, 'financials')
+
+    def quarterly_financials(self, ticker):
+        return self._field(ticker, 'quarterly_financials')
+
+    def earnings_dates(self, ticker):
+        self._wait()
+        path = self._path(ticker, 'earnings.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                return [datetime.date.fromisoformat(date) for date in json.load(f)]
+        return synthetic_earnings_dates(ticker) if self.synthetic else []
+
+
+def record_fixtures(tickers, start, end, intervals=('1d',), root=FIXTURE_DIR, source=None):
+    """Save what a (live) provider returns for each ticker as replay fixtures."""
+    source = source or YahooProvider()
+    for ticker in tickers:
+        folder = os.path.join(root, ticker.upper())
+        os.makedirs(folder, exist_ok=True)
+        for interval in intervals:
+            source.history(ticker, start, end, interval).to_parquet(os.path.join(folder, f'history_{interval}.parquet'))
+
+        with open(os.path.join(folder, 'info.json'), 'w') as f:
+            json.dump(source.info(ticker), f, default=str)
+        with open(os.path.join(folder, 'earnings.json'), 'w') as f:
+            json.dump([date.isoformat() for date in source.earnings_dates(ticker)], f)
+        for field in FIELDS[1:]:
+            frame = getattr(source, field)(ticker)
+            if frame is not None and not frame.empty:
+                # Parquet needs string column labels (statements are keyed by report date)
+                frame.columns = [str(column) for column in frame.columns]
+                frame.to_parquet(os.path.join(folder, f'{field}.parquet'))
+
+
+@st.cache_resource
+def get_provider():
+    """Return the provider for this server: MARKET_DATA_PROVIDER=yahoo (default) or replay.
+
+    Calls are coalesced and rate limited server-wide, see upstream.py.
+    """
+    from upstream import guard
+
+    if os.environ.get('MARKET_DATA_PROVIDER', 'yahoo') == 'replay':
+        return guard(ReplayProvider(
+            os.environ.get('MARKET_DATA_FIXTURES', FIXTURE_DIR),
+            latency=float(os.environ.get('MARKET_DATA_LATENCY_MS', 0)) / 1000,
+            jitter=float(os.environ.get('MARKET_DATA_JITTER_MS', 0)) / 1000,
+        ))
+    return guard(YahooProvider())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record replay fixtures from Yahoo Finance")
+    parser.add_argument("command", choices=["record"])
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--start", default=str(datetime.date.today() - datetime.timedelta(days=365)))
+    parser.add_argument("--end", default=str(datetime.date.today()))
+    parser.add_argument("--intervals", nargs="+", default=["1d"])
+    parser.add_argument("--root", default=FIXTURE_DIR)
+    args = parser.parse_args()
+
+    record_fixtures(args.tickers, args.start, args.end, args.intervals, args.root)
+    print(f"Recorded {len(args.tickers)} tickers to {args.root}")
@@ -0,0 +1,143 @@
+import time
+import logging
+import threading
+import streamlit as st
+from db_connection import table, get_pool
+
+logger = logging.getLogger(__name__)
+
+
+def table_ddl(name=table):
+    """CREATE TABLE statement for the user store."""
+    return f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            id         INT UNSIGNED NOT NULL AUTO_INCREMENT,
+            username   VARCHAR(64)  NOT NULL,
+            email      VARCHAR(255) NOT NULL,
+            dob        VARCHAR(10)  NOT NULL,
+            password   CHAR(64)     NOT NULL,
+            created_at TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id),
+            UNIQUE KEY ux_username (username),
+            KEY ix_email_dob (email, dob),
+            KEY ix_dob (dob)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """
+
+
+# Index name -> (unique, columns). One per lookup path in UserAuth:
+#   verify_user_password  WHERE username = ?           -> ux_username
+#   reset_password        WHERE email = ? AND dob = ?  -> ix_email_dob (its email prefix also serves the UPDATE)
+#   retrieve_user_id      WHERE dob = ?                -> ix_dob
+INDEXES = {
+    'ux_username': (True, ['username']),
+    'ix_email_dob': (False, ['email', 'dob']),
+    'ix_dob': (False, ['dob']),
+}
+
+
+def lookup_queries(name=table):
+    """The auth lookups run by UserAuth, with sample parameters for EXPLAIN."""
+    return {
+        'verify_user_password': (f"SELECT * FROM {name} WHERE username = %s", ('user',)),
+        'reset_password': (f"SELECT * FROM {name} WHERE email = %s AND dob = %s", ('user@example.com', '010190')),
+        'reset_password_update': (f"UPDATE {name} SET password = %s WHERE email = %s", ('x', 'user@example.com')),
+        'retrieve_user_id': (f"SELECT username FROM {name} WHERE dob = %s", ('010190',)),
+    }
+
+
+def existing_indexes(connection, name=table):
+    """Return {index name: (unique, [columns in order])} for a table."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT index_name, non_unique, column_name FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s ORDER BY index_name, seq_in_index",
+            (name,),
+        )
+        indexes = {}
+        for index_name, non_unique, column_name in cursor.fetchall():
+            unique, columns = indexes.setdefault(index_name, (not non_unique, []))
+            columns.append(column_name)
+        return indexes
+    finally:
+        cursor.close()
+
+
+def _covered(required, indexes):
+    """True when some existing index starts with the required columns (and is unique if required)."""
+    unique, columns = required
+    for existing_unique, existing_columns in indexes.values():
+        if existing_columns[:len(columns)] == columns and (existing_unique or not unique):
+            if not unique or len(existing_columns) == len(columns):
+                return True
+    return False
+
+
+def ensure_schema(connection, name=table):
+    """Create the user table if needed and add any missing lookup index."""
+    import mysql.connector
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(table_ddl(name))
+        indexes = existing_indexes(connection, name)
+
+        for index_name, (unique, columns) in INDEXES.items():
+            if _covered((unique, columns), indexes):
+                continue
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            logger.info("Creating %s %s on %s(%s)", kind, index_name, name, ", ".join(columns))
+            try:
+                cursor.execute(f"CREATE {kind} {index_name} ON {name} ({', '.join(columns)})")
+            except mysql.connector.Error as err:
+                # Typically duplicate usernames already in the table
+                logger.error("Could not create %s on %s: %s", index_name, name, err)
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+def explain_lookups(connection, name=table):
+    """EXPLAIN every auth lookup and return {lookup: index used or None}."""
+    plans = {}
+    cursor = connection.cursor(dictionary=True)
+    try:
+        for lookup, (query, params) in lookup_queries(name).items():
+            cursor.execute("EXPLAIN " + query, params)
+            rows = cursor.fetchall()
+            plans[lookup] = rows[0].get('key') if rows else None
+    finally:
+        cursor.close()
+    return plans
+
+
+@st.cache_resource
+def bootstrap_schema():
+    """Create/upgrade the user table once per server and check every lookup uses an index."""
+    with get_pool().connection() as connection:
+        ensure_schema(connection)
+        plans = explain_lookups(connection)
+
+    for lookup, index in plans.items():
+        if index is None:
+            logger.warning("%s runs as a full scan of %s", lookup, table)
+    return plans
+
+
+def _bootstrap_in_background(attempts=5, retry_after=30):
+    for attempt in range(attempts):
+        try:
+            bootstrap_schema()
+            return
+        except Exception as e:
+            logger.warning("Schema bootstrap failed (attempt %d/%d): %s", attempt + 1, attempts, e)
+            time.sleep(retry_after)
+
+
+@st.cache_resource
+def start_schema_bootstrap():
+    """Run bootstrap_schema() once per server, off the render path so the first page never waits on MySQL."""
+    thread = threading.Thread(target=_bootstrap_in_background, name='schema-bootstrap', daemon=True)
+    thread.start()
+    return thread
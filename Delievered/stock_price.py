@@ -1,11 +1,33 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
+import uuid
+import logging
 import datetime
 from UserAuth import UserAuth
+from price_store import get_price_store, INTERVALS, DAILY, earliest_start
+from universe_loader import start_universe_warmup
+from data_cache import get_data_cache
+from schema import start_schema_bootstrap
+from figure_cache import FigureCache, get_figure_cache
+from providers import get_provider
+from perf import span, timed
+from prefetch import get_prefetcher, prefetch_candidates, RECENT_TICKERS
+from fundamentals import get_fundamentals, start_fundamentals_refresh, STATEMENTS
+from page_loader import PageLoads, STALE_WAIT
+from ticker_registry import get_registry
 import streamlit as st
-import plotly.graph_objs as go
-from utils import calculate_rsi, calculate_bollinger_bands, calculate_macd
+from downsample import max_points
+
+logger = logging.getLogger(__name__)
+
+
+def describe_age(seconds):
+    """'5 minutes', '3 hours', '2 days'."""
+    for unit, size in [('day', 86400), ('hour', 3600), ('minute', 60)]:
+        if seconds >= size:
+            count = int(seconds // size)
+            return f"{count} {unit}{'s' if count > 1 else ''}"
+    return 'less than a minute'
 
 
 class StockAnalysisApp:
@@ -14,8 +36,9 @@ class StockAnalysisApp:
         self.today = datetime.date.today()
         self.start_date = self.today - datetime.timedelta(days=365)
         self.end_date = self.today
-        # self.ticker_list = pd.read_csv('stock_list.txt')
-        self.ticker_list = pd.read_csv('stock_list.txt', header=None).squeeze("columns")
+        self.interval = DAILY
+        # Parsed once per server, see ticker_registry.py
+        self.registry = get_registry()
 
         self.selected_ticker = None
 
@@ -46,6 +69,7 @@ class StockAnalysisApp:
         elif st.session_state.get("is_admin_authenticated"):
             self.auth.admin_dashboard()
 
+    @timed('page')
     def stock_analysis(self):
         st.markdown('''
         # Stock Analysis Application
@@ -54,76 +78,232 @@ class StockAnalysisApp:
         st.write('---')
         self.set_date_inputs()
         self.choose_ticker()
-        self.fetch_ticker_data()
-        self.show_stock_info()
-        self.show_financial_metrics()
-
         self.init_state_variables()
+        self.start_page_loads()
 
-        if st.button('Show Bollinger Bands'):
-            st.session_state.bollinger_bands = True
-
-        if st.session_state.bollinger_bands:
-            self.show_bollinger_bands()
-
-        if st.button('Show MACD Chart'):
-            st.session_state.macd = True
-
-        if st.session_state.macd:
-            self.show_macd()
-
-        if st.button('Show RSI'):
-            st.session_state.rsi = True
-
-        if st.session_state.rsi:
-            self.show_rsi()
-
-        if st.button('Show Analyst Ratings'):
-            st.session_state.analyst_ratings = True
-
-        if st.session_state.analyst_ratings:
-            self.show_analyst_ratings()
-
-        if st.button('Show Trading Volume Chart'):
-            st.session_state.trading_volume = True
-
-        if st.session_state.trading_volume:
-            self.show_trading_volume_chart()
-
-        if st.button('Show Income Statement'):
-            st.session_state.income_statement = True
-
-        if st.session_state.income_statement:
-            self.show_income_statement()
-
-        if st.button('Show Ticker Data'):
-            st.session_state.ticker_data = True
-
-        if st.session_state.ticker_data:
-            self.show_ticker_data()
+        # Sections are drawn in the order their data usually arrives: info is small, the history is not
+        self.info = self.ticker_field('info') or {}
+        self.show_stock_info()
+        self.show_financial_metrics()
+        self.fetch_ticker_data()
+        if self.ticker_history is None:
+            return
+        self.set_chart_range()
+
+        # Each section below is a fragment: its widgets rerun only that section, reusing the data
+        # fetched by the last full run. Sidebar inputs still rerun the whole page.
+        self.show_dashboard()
+        self.button_section('Show Analyst Ratings', 'analyst_ratings', self.show_analyst_ratings)
+        self.button_section('Show Income Statement', 'income_statement', self.show_income_statement)
+        self.button_section('Show Ticker Data', 'ticker_data', self.show_ticker_data)
+
+        self.prefetch_next_tickers()
+
+    def prefetch_next_tickers(self):
+        """Once the page is drawn, warm the shared caches for the tickers this user is likely to open next."""
+        recent = st.session_state.setdefault('recent_tickers', [])
+        if self.selected_ticker in recent:
+            recent.remove(self.selected_ticker)
+        recent.append(self.selected_ticker)
+        del recent[:-RECENT_TICKERS]
+
+        user = st.session_state.get('username') or st.session_state.setdefault('session_id', uuid.uuid4().hex)
+        # Neighbours in the listing order, not in the (capped) search results
+        candidates = prefetch_candidates(self.registry.symbols(), self.selected_ticker, recent)
+        get_prefetcher().prefetch(user, candidates, self.start_date, self.history_end, self.interval)
+
+    @st.fragment
+    def button_section(self, label, feature, show):
+        """A section revealed by a button; clicking it reruns only this fragment."""
+        if st.button(label):
+            st.session_state[feature] = True
+
+        if st.session_state[feature]:
+            show()
 
     def set_date_inputs(self):
+        self.interval = st.sidebar.selectbox("Interval", INTERVALS)
         self.start_date = st.sidebar.date_input("Start Date", self.start_date)
         self.end_date = st.sidebar.date_input("End Date", self.end_date)
 
-    def choose_ticker(self):
-        # self.selected_ticker = st.sidebar.selectbox('Stock Ticker', self.ticker_list)
-        self.selected_ticker = st.sidebar.selectbox('Stock Ticker', self.ticker_list.tolist())
+        horizon = earliest_start(self.interval)
+        if horizon is not None and self.start_date < horizon:
+            st.sidebar.caption(f"{self.interval} bars are only available from {horizon}")
+            self.start_date = horizon
+
+    def select_best_match(self):
+        """Jump to the best match as soon as a new search is entered."""
+        matches = self.registry.search(st.session_state['ticker_search'], limit=1)
+        if matches:
+            st.session_state['selected_ticker'] = matches[0]['symbol']
 
+    def choose_ticker(self):
+        """Search the universe by symbol or company name; only the matches are sent to the selectbox."""
+        query = st.sidebar.text_input('Search Ticker or Company', key='ticker_search', on_change=self.select_best_match)
+        options = [record['symbol'] for record in self.registry.search(query)]
+        if query and not options:
+            st.sidebar.caption(f'No listing matches "{query}".')
+
+        current = st.session_state.get('selected_ticker')
+        if current and current not in options and self.registry.get(current):
+            # Keep the chosen ticker while browsing other matches
+            options.insert(0, current)
+        if not options:
+            st.error("No tickers are listed in stock_list.txt.")
+            st.stop()
+
+        self.selected_ticker = st.sidebar.selectbox('Stock Ticker', options, key='selected_ticker',
+                                                    format_func=self.registry.label)
+
+    def start_page_loads(self):
+        """Request every dataset the page will show at once, so the page waits about as long as the slowest one."""
+        self.history_end = self.end_date
+        if self.interval != DAILY:
+            # Intraday views include the end date itself, so today's bars show up
+            self.history_end += datetime.timedelta(days=1)
+
+        # Shared objects are looked up here: loaders run on worker threads, outside the Streamlit script
+        store = get_price_store()
+        ticker, start, end, interval = self.selected_ticker, self.start_date, self.history_end, self.interval
+        loaders = {'history': lambda: store.get_history(ticker, start, end, interval)}
+        fields = ['info']
+        if st.session_state['analyst_ratings']:
+            fields.append('recommendations')
+        if st.session_state['income_statement']:
+            fields += STATEMENTS
+        for field in fields:
+            loaders[field] = self.field_loader(field)
+        self.loads = PageLoads(loaders)
+
+    def field_loader(self, field):
+        """Return a function loading info/recommendations/financials through the caches shared by all sessions."""
+        ticker = self.selected_ticker
+        if field in STATEMENTS:
+            # Income statements only change with earnings reports, see fundamentals.py
+            fundamentals = get_fundamentals()
+            return lambda: fundamentals.get(ticker, field)
+        cache, provider = get_data_cache(), get_provider()
+        return lambda: cache.get(ticker, field, lambda: getattr(provider, field)(ticker))
+
+    def wait_for(self, name, load, fallback=None, timeout=None):
+        """Return a dataset started by start_page_loads (or load it now).
+
+        If it is too slow or fails, return fallback() (what is stored) instead; warn and return None if nothing is.
+        """
+        try:
+            if name in self.loads:
+                return self.loads.result(name, timeout)
+            return load()
+        except TimeoutError:
+            problem = 'is taking too long'
+        except Exception as e:
+            logger.warning("Loading %s for %s failed: %s", name, self.selected_ticker, e)
+            problem = 'is unavailable right now'
+
+        stored = fallback() if fallback else None
+        if stored is None:
+            st.warning(f"{name.replace('_', ' ').capitalize()} for {self.selected_ticker} {problem}, "
+                       "try again in a moment.")
+        return stored
+
+    @timed('fetch_ticker_data')
     def fetch_ticker_data(self):
-        self.ticker_info = yf.Ticker(self.selected_ticker)
-        self.ticker_history = self.ticker_info.history(period='1d', start=self.start_date, end=self.end_date)
+        store = get_price_store()
+        ticker, start, end, interval = self.selected_ticker, self.start_date, self.history_end, self.interval
+        # With bars already stored, a slow provider only delays the page by STALE_WAIT
+        stored = store.held_until(ticker, interval) is not None
+        self.ticker_history = self.wait_for('history', lambda: store.get_history(ticker, start, end, interval),
+                                            lambda: store.snapshot(ticker, start, end, interval),
+                                            STALE_WAIT if stored else None)
+        if self.ticker_history is None:
+            return
+
+        held_until = store.held_until(ticker, interval)
+        if held_until is not None and held_until < min(end, self.today):
+            # Served from the store while the provider is slow or failing; the load carries on in the background
+            st.caption(f"Prices up to {held_until - datetime.timedelta(days=1)}: newer bars could not be "
+                       "loaded yet, they will show up on a later refresh.")
+        # Today's bars are re-fetched but not stored, so the store's version does not see them move
+        last = self.ticker_history.tail(1)
+        live = None if last.empty or last.index[0].date() < self.today else (last.index[0], float(last['Close'].iloc[0]))
+        self.data_version = (store.version(ticker, interval), live)
         self.sorted_ticker_history = self.ticker_history.sort_index(ascending=False)
 
-
+    def ticker_field(self, field):
+        """Return info/recommendations/financials for the selected ticker, waiting for its page load if one was started."""
+        with span(f'ticker_field.{field}'):
+            return self.wait_for(field, self.field_loader(field))
+
+
+    def set_chart_range(self):
+        """Let the user zoom the charts; only the visible bars are downsampled, so zooming in restores detail."""
+        index = self.ticker_history.index
+        self.chart_mask = slice(None)
+        self.chart_range = None
+
+        if len(index) > max_points():
+            first, last = index[0].date(), index[-1].date()
+            view_start, view_end = st.sidebar.slider("Chart Range", min_value=first, max_value=last, value=(first, last))
+            dates = index.date
+            self.chart_mask = (dates >= view_start) & (dates <= view_end)
+            self.chart_range = (view_start, view_end)
+
+    @st.fragment
+    @timed('show_dashboard')
+    def show_dashboard(self):
+        """Show the enabled chart panels as one figure sharing its date axis."""
+        from charts import dashboard_figure, panel_series, PANELS, INDICATOR_PARAMS
+
+        st.header('**Charts**')
+        toggles = st.columns(len(PANELS))
+        for column, (panel, (title, _)) in zip(toggles, PANELS.items()):
+            column.toggle(title.split(' (')[0], key=panel)
+
+        panels = [panel for panel in PANELS if st.session_state[panel]]
+        if panels:
+            # Unchanged charts (same ticker, dates, panels, zoom and data) come straight from the cache,
+            # and each panel's series are cached on their own, so a toggle only computes the panel it adds
+            cache = get_figure_cache()
+            view = dict(chart_range=self.chart_range, points=max_points())
+
+            def key(chart, params):
+                return FigureCache.make_key(self.selected_ticker, self.interval, self.start_date, self.end_date,
+                                            chart, dict(params, **view), self.data_version)
+
+            def series_for(panel):
+                return cache.get(key(panel, {panel: INDICATOR_PARAMS.get(panel)}),
+                                 lambda: panel_series(self.ticker_history, panel, self.chart_mask))
+
+            def build():
+                with span('build_dashboard_figure'):
+                    return dashboard_figure(self.ticker_history, panels, self.chart_mask, series_for)
+
+            figure = cache.get_figure(key('dashboard', {panel: INDICATOR_PARAMS.get(panel) for panel in panels}), build)
+            with span('plotly_chart'):
+                st.plotly_chart(figure, use_container_width=True)
+
+    @timed('show_stock_info')
     def show_stock_info(self):
-        stock_name = self.ticker_info.info['longName']
+        if not self.info:
+            st.write("Company information is not available.")
+            return
+        stock_name = self.info.get('longName') or self.info.get('shortName') or self.selected_ticker
         st.header(f'**{stock_name}**')
+        listing = self.registry.get(self.selected_ticker)
+        if listing and (listing['exchange'] or listing['sector']):
+            st.caption(' · '.join(value for value in (listing['exchange'], listing['sector']) if value))
 
-        stock_summary = self.ticker_info.info['longBusinessSummary']
-        st.info(stock_summary)
+        cache = get_data_cache()
+        if not cache.contains(self.selected_ticker, 'info'):
+            age = cache.age(self.selected_ticker, 'info')
+            if age is not None:
+                st.caption(f"Company data from {describe_age(age)} ago, refreshing in the background.")
 
-        asset_profile = self.ticker_info.info.get('assetProfile', {})
+        stock_summary = self.info.get('longBusinessSummary')
+        if stock_summary:
+            st.info(stock_summary)
+
+        asset_profile = self.info.get('assetProfile', {})
         if asset_profile:
             st.subheader(f'Asset Profile for {self.selected_ticker}')
             for key, value in asset_profile.items():
@@ -133,190 +313,53 @@ class StockAnalysisApp:
 
  
 
-    def show_bollinger_bands(self):
-        st.header('**Bollinger Bands**')
-        
-        # Calculate Bollinger Bands
-        rolling_mean, upper_band, lower_band = calculate_bollinger_bands(self.ticker_history)
-        
-        # Create the Plotly figure
-        fig = go.Figure()
-        
-        # Add traces
-        fig.add_trace(go.Scatter(x=self.ticker_history.index, y=self.ticker_history['Close'], name='Close Price'))
-        fig.add_trace(go.Scatter(x=self.ticker_history.index, y=upper_band, name='Upper Band', line=dict(color='red')))
-        fig.add_trace(go.Scatter(x=self.ticker_history.index, y=rolling_mean, name='Rolling Mean', line=dict(color='blue')))
-        fig.add_trace(go.Scatter(x=self.ticker_history.index, y=lower_band, name='Lower Band', line=dict(color='green')))
-        
-        # Update layout
-        fig.update_layout(
-            title='Bollinger Bands',
-            xaxis_title='Date',
-            yaxis_title='Price',
-            legend_title='Legend'
-        )
-        
-        # Display the figure in Streamlit
-        st.plotly_chart(fig)
-
-
-    def show_macd(self):
-        st.header('**MACD (Moving Average Convergence Divergence)**')
-        
-        # Calculate MACD components
-        macd_line, signal_line, macd_histogram = calculate_macd(self.ticker_history)
-        
-        # Create the Plotly figure
-        fig = go.Figure()
-        
-        # Add MACD line
-        fig.add_trace(go.Scatter(
-            x=self.ticker_history.index,
-            y=macd_line,
-            name='MACD Line',
-            line=dict(color='blue')
-        ))
-        
-        # Add Signal line
-        fig.add_trace(go.Scatter(
-            x=self.ticker_history.index,
-            y=signal_line,
-            name='Signal Line',
-            line=dict(color='red')
-        ))
-        
-        # Add MACD Histogram
-        fig.add_trace(go.Bar(
-            x=self.ticker_history.index,
-            y=macd_histogram,
-            name='MACD Histogram',
-            marker=dict(color='green')
-        )
-        )
-        
-        # Update layout
-        fig.update_layout(
-            title='MACD Chart',
-            xaxis_title='Date',
-            yaxis_title='MACD',
-            legend_title='Legend',
-            hovermode='x unified'
-        )
-        
-        # Display the figure in Streamlit
-        st.plotly_chart(fig)
-
-
-
-    def show_rsi(self):
-        st.header('**Relative Strength Index (RSI)**')
-        
-        # Calculate RSI
-        rsi = calculate_rsi(self.ticker_history, periods=14)
-        
-        # Create the Plotly figure
-        fig = go.Figure()
-        
-        # Add RSI line
-        fig.add_trace(go.Scatter(
-            x=self.ticker_history.index,
-            y=rsi,
-            name='RSI',
-            line=dict(color='purple')
-        ))
-        
-        # Add overbought and oversold levels
-        fig.add_trace(go.Scatter(
-            x=self.ticker_history.index,
-            y=[70] * len(self.ticker_history),
-            name='Overbought (70)',
-            line=dict(color='red', dash='dash')
-        ))
-        fig.add_trace(go.Scatter(
-            x=self.ticker_history.index,
-            y=[30] * len(self.ticker_history),
-            name='Oversold (30)',
-            line=dict(color='green', dash='dash')
-        ))
-        
-        # Update layout
-        fig.update_layout(
-            title='RSI Chart',
-            xaxis_title='Date',
-            yaxis_title='RSI',
-            legend_title='Legend',
-            hovermode='x unified'
-        )
-        
-        # Display the figure in Streamlit
-        st.plotly_chart(fig)
-
-
-    def show_trading_volume_chart(self):
-        st.header('**Trading Volume**')
-        
-        # Create the Plotly figure
-        fig = go.Figure()
-        
-        # Add volume bars
-        fig.add_trace(go.Bar(
-            x=self.ticker_history.index,
-            y=self.ticker_history['Volume'],
-            name='Volume',
-            marker=dict(color='rgba(255, 153, 51, 1.0)')  # Use a valid color format
-        ))
-        
-        # Update layout
-        fig.update_layout(
-            title='Trading Volume',
-            xaxis_title='Date',
-            yaxis_title='Volume',
-            hovermode='x unified'
-        )
-        
-        # Display the figure in Streamlit
-        st.plotly_chart(fig, use_container_width=True)
-
-
+    @timed('show_financial_metrics')
     def show_financial_metrics(self):
         st.header('**Financial Metrics**')
         metrics = {
             "Metric": ["Previous Close", "Highest in 52 wks", "Lowest in 52 wks",
                        "PE Ratio", "Beta", "PEG Ratio", "Forward PE Ratio"],
             "Value": [
-                self.ticker_info.info.get('previousClose', 'N/A'),
-                self.ticker_info.info.get('fiftyTwoWeekHigh', 'N/A'),
-                self.ticker_info.info.get('fiftyTwoWeekLow', 'N/A'),
-                self.ticker_info.info.get('trailingPE', 'N/A'),
-                self.ticker_info.info.get('beta', 'N/A'),
-                self.ticker_info.info.get('pegRatio', 'N/A'),
-                self.ticker_info.info.get('forwardPE', 'N/A')
+                self.info.get('previousClose', 'N/A'),
+                self.info.get('fiftyTwoWeekHigh', 'N/A'),
+                self.info.get('fiftyTwoWeekLow', 'N/A'),
+                self.info.get('trailingPE', 'N/A'),
+                self.info.get('beta', 'N/A'),
+                self.info.get('pegRatio', 'N/A'),
+                self.info.get('forwardPE', 'N/A')
             ]
         }
-        metrics_df = pd.DataFrame(metrics)
+        # Mixed numbers and 'N/A' are not Arrow-serialisable; strings avoid a failed conversion every rerun
+        metrics_df = pd.DataFrame(metrics).astype({'Value': str})
         st.table(metrics_df)
 
 
+    @timed('show_analyst_ratings')
     def show_analyst_ratings(self):
         st.header('**Analyst Ratings**')
-        recommendations = self.ticker_info.recommendations
+        recommendations = self.ticker_field('recommendations')
         if recommendations is not None and not recommendations.empty:
             st.write("### Latest Analyst Ratings", recommendations.tail(10))
         else:
             st.write("No analyst ratings available.")
 
 
+    @timed('show_income_statement')
     def show_income_statement(self):
-        annual_income = self.ticker_info.financials
-        quarterly_income = self.ticker_info.quarterly_financials
+        annual_income = self.ticker_field('financials')
+        quarterly_income = self.ticker_field('quarterly_financials')
 
         st.write("### Annual Income Statement", annual_income)
         st.write("### Quarterly Income Statement", quarterly_income)
 
+    @timed('show_ticker_data')
     def show_ticker_data(self):
         st.header('**Ticker Data**')
         st.write(self.sorted_ticker_history)
 
 if __name__ == "__main__":
+    start_schema_bootstrap()
+    start_universe_warmup()
+    start_fundamentals_refresh()
     app = StockAnalysisApp()
     app.run()
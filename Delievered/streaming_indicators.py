@@ -0,0 +1,318 @@
+import math
+from collections import deque
+
+# Stateful versions of the indicators in utils.py. Each object is seeded with the
+# price history once and then updated in O(1) per appended bar. The update rules
+# replicate the pandas rolling/ewm kernels step by step (including their Kahan
+# compensation), so the values match calculate_bollinger_bands, calculate_macd and
+# calculate_rsi on the same prices.
+
+
+def _divide(a, b):
+    """Float division with NumPy semantics instead of ZeroDivisionError."""
+    if b == 0 or b != b:
+        if a != a or b != b or a == 0:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class _RollingMean:
+    """pandas Rolling.mean() for a fixed window, one value at a time."""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.neg_ct = 0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = None
+
+    def _add(self, val):
+        if val != val:
+            return
+        self.nobs += 1
+        y = val - self.compensation_add
+        t = self.sum_x + y
+        self.compensation_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct += 1
+        if val == self.prev_value:
+            self.num_consecutive_same_value += 1
+        else:
+            self.num_consecutive_same_value = 1
+        self.prev_value = val
+
+    def _remove(self, val):
+        if val != val:
+            return
+        self.nobs -= 1
+        y = -val - self.compensation_remove
+        t = self.sum_x + y
+        self.compensation_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct -= 1
+
+    def update(self, val):
+        if self.prev_value is None:
+            self.prev_value = val
+        if len(self.values) == self.window:
+            self._remove(self.values.popleft())
+        self.values.append(val)
+        self._add(val)
+
+        if self.nobs < self.window or self.nobs == 0:
+            return math.nan
+        if self.num_consecutive_same_value >= self.nobs:
+            return self.prev_value
+        result = self.sum_x / self.nobs
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == self.nobs and result > 0:
+            return 0.0
+        return result
+
+    def to_dict(self):
+        state = dict(vars(self))
+        state['values'] = list(self.values)
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls(state['window'])
+        obj.__dict__.update(state)
+        obj.values = deque(state['values'])
+        return obj
+
+
+class _RollingVar:
+    """pandas Rolling.var(ddof=1) for a fixed window, one value at a time."""
+
+    def __init__(self, window, ddof=1):
+        self.window = window
+        self.ddof = ddof
+        self.values = deque()
+        self.nobs = 0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = None
+
+    def _add(self, val):
+        if val != val:
+            return
+        if val == self.prev_value:
+            self.num_consecutive_same_value += 1
+        else:
+            self.num_consecutive_same_value = 1
+        self.prev_value = val
+
+        self.nobs += 1
+        prev_mean = self.mean_x - self.compensation_add
+        y = val - self.compensation_add
+        t = y - self.mean_x
+        self.compensation_add = t + self.mean_x - y
+        self.mean_x += t / self.nobs
+        self.ssqdm_x += (val - prev_mean) * (val - self.mean_x)
+
+    def _remove(self, val):
+        if val != val:
+            return
+        self.nobs -= 1
+        if self.nobs:
+            prev_mean = self.mean_x - self.compensation_remove
+            y = val - self.compensation_remove
+            t = y - self.mean_x
+            self.compensation_remove = t + self.mean_x - y
+            self.mean_x -= t / self.nobs
+            self.ssqdm_x -= (val - prev_mean) * (val - self.mean_x)
+        else:
+            self.mean_x = 0.0
+            self.ssqdm_x = 0.0
+
+    def update(self, val):
+        if self.prev_value is None:
+            self.prev_value = val
+        if len(self.values) == self.window:
+            self._remove(self.values.popleft())
+        self.values.append(val)
+        self._add(val)
+
+        if self.nobs < self.window or self.nobs <= self.ddof:
+            return math.nan
+        if self.nobs == 1 or self.num_consecutive_same_value >= self.nobs:
+            return 0.0
+        return max(self.ssqdm_x / (self.nobs - self.ddof), 0.0)
+
+    to_dict = _RollingMean.to_dict
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls(state['window'], state['ddof'])
+        obj.__dict__.update(state)
+        obj.values = deque(state['values'])
+        return obj
+
+
+class _EWMMean:
+    """pandas ewm(span=..., adjust=False).mean(), one value at a time."""
+
+    def __init__(self, span):
+        self.span = span
+        self.alpha = 2.0 / (span + 1.0)
+        self.weighted = None
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    def update(self, cur):
+        is_observation = cur == cur
+        self.nobs += is_observation
+
+        if self.weighted is None:
+            self.weighted = cur
+        elif self.weighted == self.weighted:
+            self.old_wt *= 1.0 - self.alpha
+            if is_observation:
+                if self.weighted != cur:
+                    self.weighted = (self.old_wt * self.weighted + self.alpha * cur) / (self.old_wt + self.alpha)
+                self.old_wt = 1.0
+        elif is_observation:
+            self.weighted = cur
+
+        return self.weighted if self.nobs >= 1 else math.nan
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls(state['span'])
+        obj.__dict__.update(state)
+        return obj
+
+
+class StreamingIndicator:
+    """Common seeding and (de)serialisation for the streaming indicators."""
+
+    name = None
+
+    def seed(self, prices):
+        """Feed the price history and return the indicator value for its last bar."""
+        result = None
+        for price in prices:
+            result = self.update(price)
+        return result
+
+    @classmethod
+    def from_history(cls, data, **params):
+        """Build an indicator from a history DataFrame, like the batch functions in utils.py."""
+        indicator = cls(**params)
+        indicator.seed(data['Close'].astype(float).tolist())
+        return indicator
+
+    def to_dict(self):
+        state = {'name': self.name, 'params': self.params()}
+        for attr, part in vars(self).items():
+            if isinstance(part, (_RollingMean, _RollingVar, _EWMMean)):
+                state[attr] = part.to_dict()
+            elif attr.startswith('_'):
+                state[attr] = part
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        indicator = cls(**state['params'])
+        for attr, part in vars(indicator).items():
+            if isinstance(part, (_RollingMean, _RollingVar, _EWMMean)):
+                setattr(indicator, attr, type(part).from_dict(state[attr]))
+            elif attr.startswith('_'):
+                setattr(indicator, attr, state[attr])
+        return indicator
+
+
+class StreamingBollingerBands(StreamingIndicator):
+    """Incremental calculate_bollinger_bands: update() returns (rolling_mean, upper_band, lower_band)."""
+
+    name = 'bollinger_bands'
+
+    def __init__(self, window=20, num_std=2):
+        self.window = window
+        self.num_std = num_std
+        self.mean = _RollingMean(window)
+        self.var = _RollingVar(window)
+
+    def params(self):
+        return {'window': self.window, 'num_std': self.num_std}
+
+    def update(self, price):
+        price = float(price)
+        rolling_mean = self.mean.update(price)
+        variance = self.var.update(price)
+        rolling_std = math.sqrt(variance) if variance == variance else math.nan
+        upper_band = rolling_mean + (rolling_std * self.num_std)
+        lower_band = rolling_mean - (rolling_std * self.num_std)
+        return rolling_mean, upper_band, lower_band
+
+
+class StreamingMACD(StreamingIndicator):
+    """Incremental calculate_macd: update() returns (macd_line, signal_line, macd_histogram)."""
+
+    name = 'macd'
+
+    def __init__(self, short_window=12, long_window=26, signal_window=9):
+        self.short_window = short_window
+        self.long_window = long_window
+        self.signal_window = signal_window
+        self.short_ema = _EWMMean(short_window)
+        self.long_ema = _EWMMean(long_window)
+        self.signal_ema = _EWMMean(signal_window)
+
+    def params(self):
+        return {'short_window': self.short_window, 'long_window': self.long_window, 'signal_window': self.signal_window}
+
+    def update(self, price):
+        price = float(price)
+        macd_line = self.short_ema.update(price) - self.long_ema.update(price)
+        signal_line = self.signal_ema.update(macd_line)
+        return macd_line, signal_line, macd_line - signal_line
+
+
+class StreamingRSI(StreamingIndicator):
+    """Incremental calculate_rsi: update() returns the RSI of the appended bar."""
+
+    name = 'rsi'
+
+    def __init__(self, periods=14):
+        self.periods = periods
+        self.gain = _RollingMean(periods)
+        self.loss = _RollingMean(periods)
+        self._last_price = math.nan
+
+    def params(self):
+        return {'periods': self.periods}
+
+    def update(self, price):
+        price = float(price)
+        delta = price - self._last_price
+        self._last_price = price
+
+        # Same as delta.where(delta > 0, 0) and -delta.where(delta < 0, 0), NaN deltas count as 0
+        gain = self.gain.update(delta if delta > 0 else 0.0)
+        loss = self.loss.update(-delta if delta < 0 else -0.0)
+        rs = _divide(gain, loss)
+        return 100 - _divide(100, 1 + rs)
+
+
+INDICATORS = {cls.name: cls for cls in (StreamingBollingerBands, StreamingMACD, StreamingRSI)}
+
+
+def indicator_from_dict(state):
+    """Rebuild any streaming indicator from its to_dict() state."""
+    return INDICATORS[state['name']].from_dict(state)
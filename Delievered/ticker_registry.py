@@ -0,0 +1,164 @@
+"""The ticker universe: symbol, company name, exchange and sector of every listing the app offers.
+
+The listing file has one symbol per line, optionally followed by CSV metadata columns
+(a header line starting with "symbol" is skipped):
+
+    AAPL,Apple Inc.,NASDAQ,Technology
+    "BRK-B","Berkshire Hathaway Inc.",NYSE,Financial Services
+
+It is parsed once per server and again only when its modification time changes.
+"""
+import os
+import csv
+import bisect
+import logging
+import threading
+from collections import defaultdict
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+UNIVERSE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stock_list.txt')
+COLUMNS = ['symbol', 'name', 'exchange', 'sector']
+# Matches offered by a search
+SEARCH_LIMIT = 50
+# Share of a query's trigrams a name must contain to count as a fuzzy match
+FUZZY_MIN_OVERLAP = 0.6
+
+
+def read_listings(path):
+    """Parse a listing file into records {symbol, name, exchange, sector}, in file order, one per symbol."""
+    listings = {}
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].strip().lower() == 'symbol':
+                continue
+            values = [value.strip() for value in row[:len(COLUMNS)]]
+            record = dict(zip(COLUMNS, values + [''] * (len(COLUMNS) - len(values))))
+            record['symbol'] = record['symbol'].upper()
+            listings.setdefault(record['symbol'], record)
+    return list(listings.values())
+
+
+def trigrams(text):
+    text = f' {text.upper()} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Prefix search over symbols and name words (sorted keys + bisect, a flat trie) and a trigram index for typos."""
+
+    def __init__(self, listings):
+        self.listings = listings
+        self.positions = {record['symbol']: i for i, record in enumerate(listings)}
+        # (key, position) pairs; a prefix's matches are one contiguous run of the sorted list
+        self._symbols = sorted((record['symbol'], i) for i, record in enumerate(listings))
+        self._words = sorted({(word, i) for i, record in enumerate(listings)
+                              for word in record['name'].upper().replace(',', ' ').split()})
+        self._trigrams = defaultdict(set)
+        for i, record in enumerate(listings):
+            for gram in trigrams(record['symbol']) | trigrams(record['name']):
+                self._trigrams[gram].add(i)
+
+    @staticmethod
+    def _prefixed(keys, prefix):
+        start = bisect.bisect_left(keys, (prefix,))
+        for key, position in keys[start:]:
+            if not key.startswith(prefix):
+                break
+            yield position
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Positions of the listings matching query, best first.
+
+        Exact symbol, then symbol prefix, then names with a word starting with each query word, then names
+        sharing most of the query's trigrams.
+        """
+        query = query.strip().upper()
+        if not query:
+            return list(range(min(limit, len(self.listings))))
+
+        found = {}
+
+        def add(positions, rank):
+            for position in positions:
+                if len(found) >= limit:
+                    return
+                found.setdefault(position, rank)
+
+        if query in self.positions:
+            add([self.positions[query]], 0)
+        add(self._prefixed(self._symbols, query), 1)
+        words = query.replace(',', ' ').split()
+        if words:
+            named = set(self._prefixed(self._words, words[0]))
+            for word in words[1:]:
+                named &= set(self._prefixed(self._words, word))
+            add(sorted(named), 2)
+        if len(found) < limit:
+            grams = trigrams(query)
+            counts = defaultdict(int)
+            for gram in grams:
+                for position in self._trigrams.get(gram, ()):
+                    counts[position] += 1
+            needed = FUZZY_MIN_OVERLAP * len(grams)
+            add(sorted((position for position, count in counts.items() if count >= needed),
+                       key=lambda position: -counts[position]), 3)
+        return sorted(found, key=found.get)
+
+
+class TickerRegistry:
+    """The listings and their search index, reloaded when the listing file changes on disk."""
+
+    def __init__(self, path=UNIVERSE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._index = SearchIndex([])
+        self.reloads = 0
+        self._check()
+
+    def _check(self):
+        """Reparse the listing file if its modification time changed; keep the old listings if it cannot be read."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            logger.warning("Ticker listing %s unavailable: %s", self.path, e)
+            return self._index
+        if mtime == self._mtime:
+            return self._index
+
+        with self._lock:
+            if mtime != self._mtime:
+                self._index = SearchIndex(read_listings(self.path))
+                self._mtime = mtime
+                self.reloads += 1
+                logger.info("Loaded %d listings from %s", len(self._index.listings), self.path)
+        return self._index
+
+    def symbols(self):
+        return [record['symbol'] for record in self._check().listings]
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Listings matching a symbol or company name fragment, best first."""
+        index = self._check()
+        return [index.listings[position] for position in index.search(query, limit)]
+
+    def get(self, symbol):
+        index = self._check()
+        position = index.positions.get(symbol.upper())
+        return None if position is None else index.listings[position]
+
+    def label(self, symbol):
+        """'AAPL · Apple Inc.' for a selectbox option."""
+        record = self.get(symbol)
+        return f"{symbol} · {record['name']}" if record and record['name'] else symbol
+
+    def stats(self):
+        return {'listings': len(self._check().listings), 'reloads': self.reloads}
+
+
+@st.cache_resource
+def get_registry(path=UNIVERSE_PATH):
+    """Return the ticker registry shared by every session of this server."""
+    return TickerRegistry(path)
@@ -0,0 +1,94 @@
+import time
+import logging
+import datetime
+import threading
+import streamlit as st
+from price_store import get_price_store, OVERLAP_DAYS
+from upstream import background
+from ticker_registry import get_registry, UNIVERSE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Symbols per multi-ticker download request
+CHUNK_SIZE = 10
+# Attempts per chunk before the remaining symbols are given up on until the next refresh
+MAX_RETRIES = 3
+# Seconds between two refreshes of the whole universe
+REFRESH_INTERVAL = 15 * 60
+# History warmed for symbols the store does not hold yet, matching the default sidebar range
+DEFAULT_LOOKBACK_DAYS = 365
+
+
+def download_universe(tickers, start, end, store=None, chunk_size=CHUNK_SIZE, retries=MAX_RETRIES):
+    """Pull [start, end) for every ticker in chunked multi-symbol requests and merge it into the store."""
+    store = store or get_price_store()
+    loaded = []
+
+    for i in range(0, len(tickers), chunk_size):
+        pending = list(tickers[i:i + chunk_size])
+
+        for attempt in range(retries):
+            try:
+                frames = store.provider.download(pending, start, end)
+            except Exception as e:
+                logger.warning("Batch download of %s failed: %s", pending, e)
+                frames = {}
+
+            for ticker, frame in frames.items():
+                store.store_history(ticker, frame, start, end)
+                loaded.append(ticker)
+
+            pending = [ticker for ticker in pending if ticker not in frames]
+            if not pending:
+                break
+            # Back off only when another attempt follows
+            if attempt + 1 < retries:
+                time.sleep(2 ** attempt)
+
+        if pending:
+            logger.warning("Giving up on %s until the next refresh", pending)
+
+    return loaded
+
+
+def refresh_universe(tickers, store=None):
+    """Bring every ticker up to date, grouping symbols that need the same start date into one request."""
+    store = store or get_price_store()
+    today = datetime.date.today()
+    default_start = today - datetime.timedelta(days=DEFAULT_LOOKBACK_DAYS)
+
+    groups = {}
+    for ticker in tickers:
+        coverage = store.coverage(ticker)
+        if coverage is None or coverage[0] > default_start:
+            start = default_start
+        elif coverage[1] >= today:
+            continue
+        else:
+            start = coverage[1] - datetime.timedelta(days=OVERLAP_DAYS)
+        groups.setdefault(start, []).append(ticker)
+
+    loaded = []
+    for start, group in groups.items():
+        loaded += download_universe(group, start, today, store)
+    return loaded
+
+
+def _refresh_forever(registry):
+    while True:
+        try:
+            # Asked every round, so symbols added to the listing file are picked up
+            with background():
+                loaded = refresh_universe(registry.symbols())
+            logger.info("Universe refresh loaded %d tickers", len(loaded))
+        except Exception as e:
+            logger.exception("Universe refresh failed: %s", e)
+        time.sleep(REFRESH_INTERVAL)
+
+
+@st.cache_resource
+def start_universe_warmup(path=UNIVERSE_PATH):
+    """Warm the price store for the whole universe once per server, then keep it fresh in the background."""
+    thread = threading.Thread(target=_refresh_forever, args=(get_registry(path),), name='universe-warmup', daemon=True)
+    thread.start()
+    return thread
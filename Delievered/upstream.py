@@ -0,0 +1,363 @@
+"""Shared guard around the market data provider: every upstream call of the server goes through it.
+
+Concurrent identical calls (same method and arguments) share one in-flight request, and the requests
+that do go out draw from one token bucket. After repeated failures a circuit breaker fails calls
+fast (callers serve what they have stored) and lets one probe through now and then until the
+provider recovers. Page loads wait ahead of background work:
+
+    with background():
+        provider.history(...)   # prefetches, universe warmup and nightly refreshes queue behind users
+
+A queued background call inherits the priority of a page load that needs it: one that joins its
+flight, or one waiting on a store's ticker lock held by it (see priority_lock()).
+
+Try it against the replay provider (no network), e.g. 50 users opening the same ticker at once:
+
+    python upstream.py --users 50 --tickers 2 --rate 5 --latency-ms 200
+"""
+import os
+import time
+import argparse
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from providers import MarketDataProvider
+
+# Requests per second sent upstream, and how many may go out back to back after a quiet spell
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+# Consecutive failures that open the circuit, and seconds before a probe call is let through
+BREAKER_FAILURES = 5
+BREAKER_RESET = 30
+# Seconds between priority boosts while a page load waits on a ticker lock
+BOOST_POLL = 0.05
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_priority = threading.local()
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling the provider while the circuit breaker is open."""
+
+
+@contextmanager
+def background():
+    """Run the calls made by this thread inside the block behind any waiting page loads."""
+    previous = getattr(_priority, 'value', INTERACTIVE)
+    _priority.value = BACKGROUND
+    try:
+        yield
+    finally:
+        _priority.value = previous
+
+
+def current_priority():
+    return getattr(_priority, 'value', INTERACTIVE)
+
+
+def carry_priority(fn):
+    """Wrap fn so it runs with the calling thread's priority, e.g. when handed to a worker pool."""
+    priority = current_priority()
+
+    def run(*args, **kwargs):
+        previous = current_priority()
+        _priority.value = priority
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _priority.value = previous
+    return run
+
+
+@contextmanager
+def priority_lock(lock, provider, ticker):
+    """Hold a store's per-ticker lock; while a page load waits for it, raise the ticker's queued upstream calls.
+
+    The holder may be a background fetch waiting for a token: without the boost the page would wait behind it.
+    """
+    if not lock.acquire(blocking=False):
+        boost = getattr(provider, 'boost', None)
+        while not lock.acquire(timeout=BOOST_POLL):
+            if boost is not None and current_priority() == INTERACTIVE:
+                boost(ticker)
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+class Ticket:
+    """A place in the token bucket queue; its priority can be raised while it waits."""
+
+    def __init__(self, priority=INTERACTIVE):
+        self.priority = priority
+
+
+class SingleFlight:
+    """Let concurrent callers with the same key share one call and its result (or exception).
+
+    The call gets a Ticket at the leader's priority; a more urgent caller joining it raises the ticket through boost.
+    """
+
+    def __init__(self, boost=None):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._boost = boost
+        self.coalesced = 0
+
+    def do(self, key, fn, priority=INTERACTIVE):
+        """Return fn(ticket), shared with every concurrent caller of the same key."""
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = (Future(), Ticket(priority))
+            else:
+                self.coalesced += 1
+        future, ticket = flight
+        if not leader:
+            if self._boost is not None and priority < ticket.priority:
+                self._boost(ticket, priority)
+            return future.result()
+
+        try:
+            future.set_result(fn(ticket))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result()
+
+    def boost_matching(self, matches, priority):
+        """Raise the tickets of the calls in flight whose key matches(key)."""
+        with self._lock:
+            tickets = [ticket for key, (_, ticket) in self._calls.items() if matches(key) and priority < ticket.priority]
+        for ticket in tickets:
+            self._boost(ticket, priority)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class TokenBucket:
+    """Allow rate acquisitions per second (burst at once); waiters are served by priority, then arrival."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        # (ticket, arrival) pairs; priorities can change while waiting, so the head is looked up each time
+        self._waiters = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self.counters = {'granted': 0, 'queued': 0, 'max_queue': 0, 'wait_seconds': 0.0, 'boosted': 0}
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _head(self):
+        return min(self._waiters, key=lambda waiter: (waiter[0].priority, waiter[1]))
+
+    def acquire(self, ticket=None):
+        """Block until a token is free and no more urgent caller is waiting; return the seconds waited."""
+        ticket = ticket or Ticket()
+        with self._cond:
+            self._refill()
+            if not self._waiters and self._tokens >= 1:
+                self._tokens -= 1
+                self.counters['granted'] += 1
+                return 0.0
+
+            started = self.clock()
+            entry = (ticket, next(self._order))
+            self._waiters.append(entry)
+            self.counters['queued'] += 1
+            self.counters['max_queue'] = max(self.counters['max_queue'], len(self._waiters))
+            while True:
+                self._refill()
+                first = self._head() is entry
+                if first and self._tokens >= 1:
+                    break
+                if first:
+                    self._cond.wait((1 - self._tokens) / self.rate)
+                else:
+                    self._cond.wait()
+            self._waiters.remove(entry)
+            self._tokens -= 1
+            # The next waiter may be able to go now too
+            self._cond.notify_all()
+
+            waited = self.clock() - started
+            self.counters['granted'] += 1
+            self.counters['wait_seconds'] += waited
+            return waited
+
+    def boost(self, ticket, priority):
+        """Raise a ticket's priority, also while it is already queued."""
+        with self._cond:
+            if priority < ticket.priority:
+                ticket.priority = priority
+                self.counters['boosted'] += 1
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return dict(self.counters, waiting=len(self._waiters))
+
+
+class CircuitBreaker:
+    """Closed while calls succeed; open after `failures` failures in a row, half-open for one probe every `reset_after` seconds."""
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_after=BREAKER_RESET, clock=time.monotonic):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.clock = clock
+        self.state = 'closed'
+        self._failed = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+        self.counters = {'opened': 0, 'rejected': 0, 'probes': 0}
+
+    def allow(self):
+        """True if a call may go out now; while open, only one probe per reset_after seconds."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and self.clock() - self._opened_at >= self.reset_after:
+                self.state = 'half_open'
+                self.counters['probes'] += 1
+                return True
+            self.counters['rejected'] += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failed = 0
+
+    def failure(self):
+        with self._lock:
+            self._failed += 1
+            if self.state == 'half_open' or self._failed >= self.failures:
+                if self.state != 'open':
+                    self.counters['opened'] += 1
+                self.state = 'open'
+                self._opened_at = self.clock()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, state=self.state, consecutive_failures=self._failed)
+
+
+class GuardedProvider(MarketDataProvider):
+    """Wrap a provider so its calls are coalesced, rate limited and cut off while it keeps failing."""
+
+    def __init__(self, provider, rate=DEFAULT_RATE, burst=DEFAULT_BURST, breaker=None):
+        self.provider = provider
+        self.name = provider.name
+        self.namespace = provider.namespace
+        self.bucket = TokenBucket(rate, burst)
+        self.flights = SingleFlight(self.bucket.boost)
+        self.breaker = breaker or CircuitBreaker()
+        self.calls = 0
+
+    def _call(self, method, *args):
+        def request(ticket):
+            if not self.breaker.allow():
+                raise UpstreamUnavailable(f"{self.name} is failing, not calling {method} for now")
+            self.bucket.acquire(ticket)
+            self.calls += 1
+            try:
+                result = getattr(self.provider, method)(*args)
+            except Exception:
+                self.breaker.failure()
+                raise
+            self.breaker.success()
+            return result
+
+        return self.flights.do((method,) + tuple(map(str, args)), request, current_priority())
+
+    def boost(self, ticker):
+        """Move the queued calls for ticker ahead of background work, for a page load that waits on them."""
+        self.flights.boost_matching(lambda key: key[1] == str(ticker), INTERACTIVE)
+
+    def history(self, ticker, start, end, interval='1d'):
+        return self._call('history', ticker, start, end, interval)
+
+    def info(self, ticker):
+        return self._call('info', ticker)
+
+    def recommendations(self, ticker):
+        return self._call('recommendations', ticker)
+
+    def financials(self, ticker):
+        return self._call('financials', ticker)
+
+    def quarterly_financials(self, ticker):
+        return self._call('quarterly_financials', ticker)
+
+    def earnings_dates(self, ticker):
+        return self._call('earnings_dates', ticker)
+
+    def download(self, tickers, start, end):
+        if type(self.provider).download is MarketDataProvider.download:
+            # No batch endpoint: one limited history call per ticker
+            return super().download(tickers, start, end)
+        return self._call('download', tuple(tickers), start, end)
+
+    def stats(self):
+        return dict(self.bucket.stats(), calls=self.calls, coalesced=self.flights.coalesced,
+                    in_flight=self.flights.in_flight(), breaker=self.breaker.stats(), provider=self.provider.stats())
+
+
+def guard(provider):
+    """Wrap provider with the limits from MARKET_DATA_RATE (requests/s) and MARKET_DATA_BURST."""
+    return GuardedProvider(
+        provider,
+        rate=float(os.environ.get('MARKET_DATA_RATE', DEFAULT_RATE)),
+        burst=int(os.environ.get('MARKET_DATA_BURST', DEFAULT_BURST)),
+    )
+
+
+if __name__ == "__main__":
+    from providers import ReplayProvider
+
+    parser = argparse.ArgumentParser(description="Simulate many users opening the same tickers at once")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--tickers", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE)
+    parser.add_argument("--burst", type=int, default=DEFAULT_BURST)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    source = ReplayProvider(latency=args.latency_ms / 1000)
+    provider = GuardedProvider(source, args.rate, args.burst)
+    tickers = [f'T{i}' for i in range(args.tickers)]
+
+    def open_page(user):
+        ticker = tickers[user % len(tickers)]
+        provider.info(ticker)
+        provider.history(ticker, '2024-01-01', '2024-06-01')
+
+    def warm(ticker):
+        with background():
+            provider.recommendations(ticker)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users + args.tickers) as pool:
+        jobs = [pool.submit(warm, f'B{i}') for i in range(args.tickers)]
+        jobs += [pool.submit(open_page, user) for user in range(args.users)]
+        for job in jobs:
+            job.result()
+    print(f"{args.users} users, {time.perf_counter() - started:.2f}s, "
+          f"{source.calls} upstream calls for {2 * args.users + args.tickers} requests")
+    print(provider.stats())
@@ -0,0 +1,64 @@
+from db_connection import table
+
+# Columns the admin listing can be sorted by; username breaks ties so every row has a unique position
+SORT_COLUMNS = ["username", "email", "dob"]
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Rows pulled from the server per fetchmany() round trip
+FETCH_CHUNK = 50
+
+
+def fetch_user_page(connection, search="", sort="username", descending=False, page_size=25, after=None):
+    """Return one keyset-paginated page of (username, email, dob) rows and the cursor of the next page.
+
+    after is the (sort value, username) of the last row of the previous page, or None for
+    the first page. The returned cursor is None when there are no more rows.
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Cannot sort users by {sort!r}")
+
+    conditions, params = [], []
+    if search:
+        # Prefix matches so the username/email indexes can serve the search
+        conditions.append("(username LIKE %s OR email LIKE %s)")
+        pattern = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        params += [pattern, pattern]
+
+    op = "<" if descending else ">"
+    if after is not None:
+        if sort == "username":
+            conditions.append(f"username {op} %s")
+            params.append(after[1])
+        else:
+            conditions.append(f"({sort} {op} %s OR ({sort} = %s AND username {op} %s))")
+            params += [after[0], after[0], after[1]]
+
+    direction = "DESC" if descending else "ASC"
+    query = f"SELECT username, email, dob FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {sort} {direction}"
+    if sort != "username":
+        query += f", username {direction}"
+    # One extra row tells us whether a next page exists
+    query += " LIMIT %s"
+    params.append(page_size + 1)
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, tuple(params))
+        rows = []
+        while True:
+            chunk = cursor.fetchmany(FETCH_CHUNK)
+            if not chunk:
+                break
+            rows.extend(chunk)
+    finally:
+        cursor.close()
+
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, (last[SORT_COLUMNS.index(sort)], last[0])
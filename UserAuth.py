@@ -5,10 +5,9 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-import mysql.connector
-from db_connection import db_connection, table
+from db_connection import table, get_pool, db_error, PoolTimeout
 
-cursor = db_connection()
+# The database is only contacted once a form actually needs it, never at import
 supabase = None
 
 class UserAuth:
@@ -227,9 +226,14 @@ class UserAuth:
         """Allow the admin to view all users in the MySQL database."""
 
         try:
-            cursor = supabase.cursor()  # Create a cursor
-            cursor.execute(f"SELECT username, email, dob FROM {table}")  # Fetch data
-            users = cursor.fetchall()  # Get all rows
+            # Borrow a connection from the shared pool
+            with get_pool().connection() as connection:
+                cursor = connection.cursor()  # Create a cursor
+                try:
+                    cursor.execute(f"SELECT username, email, dob FROM {table}")  # Fetch data
+                    users = cursor.fetchall()  # Get all rows
+                finally:
+                    cursor.close()  # Close the cursor
 
             if users:
                 st.write("Current Users in the Database:")
@@ -238,12 +242,9 @@ class UserAuth:
             else:
                 st.warning("No users found in the database.")
 
-        except mysql.connector.Error as err:
+        except (db_error(), PoolTimeout) as err:
             st.error(f"Database error: {err}")
 
-        finally:
-            cursor.close()  # Close the cursor
-
 
     def admin_dashboard(self):
         """Show the admin dashboard in the sidebar."""
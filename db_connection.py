@@ -1,35 +1,64 @@
 import streamlit as st
-import mysql.connector
-import toml
+from db_pool import ConnectionPool, PoolTimeout
 
 
-# Extract database credentials
-db_config = st.secrets["connections"]["freesqldatabase"]
+table = 'user_accounts' 
 
-# Use credentials in your script
-# url = db_config["host"]
-key = {
-    "host": db_config["host"],
-    "database": db_config["database"],
-    "user": db_config["user"],
-    "password": db_config["password"],
-    "port": db_config["port"]
-}
+# Pool sizing defaults, overridable from the same secrets section
+POOL_SIZE        = 5
+POOL_MAX_IDLE    = 300
+CHECKOUT_TIMEOUT = 5
+
+
+def db_config():
+    """Extract database credentials; read on first use rather than at import."""
+    return st.secrets["connections"]["freesqldatabase"]
+
+
+def connect():
+    """Open a new MySQL connection."""
+    import mysql.connector
+
+    config = db_config()
+    return mysql.connector.connect(
+        host=config["host"],
+        user=config["user"],
+        password=config["password"],
+        database=config["database"],
+        port=config["port"]
+    )
+
+
+def db_error():
+    """mysql.connector.Error, imported on first use.
+
+    Use as `except db_error() as err:`; an except clause is only evaluated once an exception is raised.
+    """
+    import mysql.connector
+
+    return mysql.connector.Error
+
+
+@st.cache_resource
+def get_pool():
+    """Return the MySQL connection pool shared by every session of this server."""
+    config = db_config()
+    return ConnectionPool(
+        connect,
+        max_size=config.get("pool_size", POOL_SIZE),
+        max_idle=config.get("pool_max_idle", POOL_MAX_IDLE),
+        checkout_timeout=config.get("pool_checkout_timeout", CHECKOUT_TIMEOUT),
+    )
 
-table = 'user_accounts' 
 
 def db_connection():
     # Establishing MySQL Connection
+    import mysql.connector
+
     try:
-        supabase = mysql.connector.connect(
-            host=key["host"],
-            user=key["user"],
-            password=key["password"],
-            database=key["database"],
-            port=key["port"]
-        )
+        supabase = connect()
         cursor = supabase.cursor()
 
         return cursor
     except mysql.connector.Error as err:
-        st.error(f"Error: {err}")
\ No newline at end of file
+        st.error(f"Error: {err}")
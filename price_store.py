@@ -0,0 +1,145 @@
+import os
+import json
+import datetime
+import threading
+import pandas as pd
+import streamlit as st
+
+# Price partitions live next to the app, one Parquet file per ticker
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.price_store')
+
+# Days of already stored bars re-requested with every tail fetch, used to detect
+# split/dividend re-adjustments of the history we already hold
+OVERLAP_DAYS = 7
+
+
+def _as_date(value):
+    """Normalise a date, datetime or string to a datetime.date."""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+class PriceStore:
+    """Local OHLCV store that only asks the provider for the part of a range it does not hold."""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _paths(self, ticker):
+        base = os.path.join(self.root, ticker.upper())
+        return base + '.parquet', base + '.json'
+
+    def _load(self, ticker):
+        """Read the stored bars and the date range they cover."""
+        data_path, meta_path = self._paths(ticker)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        coverage = (_as_date(meta['start']), _as_date(meta['end']))
+        return pd.read_parquet(data_path), coverage
+
+    def _save(self, ticker, frame, coverage):
+        """Write the bars first and the coverage last, so a crash never over-reports coverage.
+
+        Bars at or after the coverage end (today's, still moving) are not stored.
+        """
+        data_path, meta_path = self._paths(ticker)
+        frame = frame[frame.index < pd.Timestamp(coverage[1]).tz_localize(frame.index.tz)]
+        frame.to_parquet(data_path + '.tmp')
+        os.replace(data_path + '.tmp', data_path)
+
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump({'start': coverage[0].isoformat(), 'end': coverage[1].isoformat()}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _fetch(self, ticker, start, end):
+        import yfinance as yf
+
+        return yf.Ticker(ticker).history(period='1d', start=start, end=end)
+
+    def get_history(self, ticker, start, end):
+        """Return daily bars for [start, end), fetching only the missing head/tail of the range."""
+        start, end = _as_date(start), _as_date(end)
+        today = datetime.date.today()
+
+        with self._lock(ticker):
+            frame, coverage = self._load(ticker)
+            held = coverage
+
+            if coverage is None:
+                frame = self._fetch(ticker, start, end)
+                coverage = (start, end)
+            else:
+                cov_start, cov_end = coverage
+                parts = [frame]
+
+                if start < cov_start:
+                    parts.append(self._fetch(ticker, start, cov_start))
+
+                if end > cov_end:
+                    tail = self._fetch(ticker, cov_end - datetime.timedelta(days=OVERLAP_DAYS), end)
+                    if not self._overlap_matches(frame, tail, cov_end):
+                        # History was re-adjusted upstream, throw away what we hold
+                        parts = [self._fetch(ticker, min(start, cov_start), end)]
+                        held = None
+                    else:
+                        parts.append(tail)
+
+                frame = self._merge(parts)
+                coverage = (min(start, cov_start), max(end, cov_end))
+
+            # Bars for today are still moving, never record them as covered
+            coverage = (coverage[0], min(coverage[1], today))
+            # Re-fetching only today's bars changes nothing stored
+            if coverage != held and coverage[0] < coverage[1] and not frame.empty:
+                self._save(ticker, frame, coverage)
+
+        return self._slice(frame, start, end)
+
+    def _overlap_matches(self, stored, fetched, until=None):
+        """Check that re-fetched bars agree with the stored ones on the dates both hold (before until, if given)."""
+        common = stored.index.intersection(fetched.index)
+        if until is not None and len(common):
+            # Bars from the coverage end on were still moving when stored
+            common = common[common < pd.Timestamp(until).tz_localize(common.tz)]
+        if len(common) == 0:
+            return True
+        old = stored.loc[common, 'Close']
+        new = fetched.loc[common, 'Close']
+        return bool(((old - new).abs() <= 1e-6 * new.abs().clip(lower=1.0)).all())
+
+    @staticmethod
+    def _merge(parts):
+        parts = [part for part in parts if part is not None and not part.empty]
+        if not parts:
+            return pd.DataFrame()
+        frame = pd.concat(parts)
+        frame = frame[~frame.index.duplicated(keep='last')]
+        return frame.sort_index()
+
+    @staticmethod
+    def _slice(frame, start, end):
+        if frame is None or frame.empty:
+            return pd.DataFrame() if frame is None else frame
+        tz = frame.index.tz
+        lower = pd.Timestamp(start).tz_localize(tz)
+        upper = pd.Timestamp(end).tz_localize(tz)
+        return frame[(frame.index >= lower) & (frame.index < upper)]
+
+
+@st.cache_resource
+def get_price_store():
+    """Return the price store shared by every session of this server."""
+    return PriceStore()
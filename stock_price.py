@@ -1,10 +1,8 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import cufflinks as cf
 import datetime
 from UserAuth import UserAuth
-import mysql.connector
+from price_store import get_price_store
 import streamlit as st
 
 
@@ -111,8 +109,11 @@ class StockAnalysisApp:
         self.selected_ticker = st.sidebar.selectbox('Stock Ticker', self.ticker_list.tolist())
 
     def fetch_ticker_data(self):
+        # Provider and charting libraries are only imported once a ticker page is shown
+        import yfinance as yf
+
         self.ticker_info = yf.Ticker(self.selected_ticker)
-        self.ticker_history = self.ticker_info.history(period='1d', start=self.start_date, end=self.end_date)
+        self.ticker_history = get_price_store().get_history(self.selected_ticker, self.start_date, self.end_date)
         self.sorted_ticker_history = self.ticker_history.sort_index(ascending=False)
 
 
@@ -151,6 +152,8 @@ class StockAnalysisApp:
         st.table(metrics_df)
 
     def show_bollinger_bands(self):
+        import cufflinks as cf  # also adds .iplot() to pandas objects
+
         st.header('**Bollinger Bands**')
         quant_fig = cf.QuantFig(self.ticker_history, title='Bollinger Bands Chart', legend='top', name=self.selected_ticker)
         quant_fig.add_bollinger_bands()
@@ -158,6 +161,8 @@ class StockAnalysisApp:
         st.plotly_chart(fig)
 
     def show_macd(self):
+        import cufflinks as cf  # also adds .iplot() to pandas objects
+
         st.header('**MACD (Moving Average Convergence Divergence)**')
         quant_fig_macd = cf.QuantFig(self.ticker_history, title="MACD Chart", legend='top', name=self.selected_ticker)
         quant_fig_macd.add_macd()
@@ -165,6 +170,8 @@ class StockAnalysisApp:
         st.plotly_chart(fig_macd)
 
     def show_rsi(self):
+        import cufflinks as cf  # also adds .iplot() to pandas objects
+
         st.header('**Relative Strength Index (RSI)**')
         quant_fig_rsi = cf.QuantFig(self.ticker_history, title="RSI Chart", legend='top', name=self.selected_ticker)
         quant_fig_rsi.add_rsi(periods=14, showbands=False)
@@ -180,6 +187,8 @@ class StockAnalysisApp:
             st.write("No analyst ratings available.")
 
     def show_trading_volume_chart(self):
+        import cufflinks as cf  # also adds .iplot() to pandas objects
+
         st.header('**Trading Volume**')
         volume_chart = self.ticker_history['Volume'].iplot(asFigure=True, kind='bar', xTitle='Date', yTitle='Volume', title='Trading Volume', theme='pearl')
         st.plotly_chart(volume_chart, use_container_width=True)